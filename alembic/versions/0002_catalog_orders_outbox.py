@@ -0,0 +1,113 @@
+"""Hot-route indexes, stock shards, order item snapshots, email outbox and idempotency keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 17:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to app.products.models.search_document, or the planner won't use the index
+SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(category, '')), 'B'))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("products", sa.Column("stock_shards", sa.Integer(), server_default="0", nullable=False))
+    op.create_index("ix_products_category_price", "products", ["category", "price", "id"])  # Also serves category-only filters
+    op.create_index("ix_products_category_name", "products", ["category", "name", "id"])
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index("ix_products_name_id", "products", ["name", "id"])
+    if op.get_bind().dialect.name == "postgresql":
+        op.create_index("ix_products_search_vector", "products", [sa.text(SEARCH_DOCUMENT)], postgresql_using="gin")
+
+    op.create_table(
+        "product_stock_shards",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("stock", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id", "shard"),
+    )
+
+    op.create_index("ix_orders_user_id_created_at", "orders", ["user_id", "created_at", "id"])  # Order history keyset
+    op.create_index("ix_orders_created_at", "orders", ["created_at"])
+
+    op.add_column("order_items", sa.Column("product_name", sa.String(), nullable=True))
+    op.add_column("order_items", sa.Column("product_image_url", sa.String(), nullable=True))
+    op.create_index("ix_order_items_order_id", "order_items", ["order_id"])
+    # Existing orders get the snapshot from the catalog as it is now, the closest record there is
+    op.execute(
+        "UPDATE order_items SET "
+        "product_name = (SELECT name FROM products WHERE products.id = order_items.product_id), "
+        "product_image_url = (SELECT image_url FROM products WHERE products.id = order_items.product_id)"
+    )
+
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("to_email", sa.String(), nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("status", sa.Enum("pending", "sent", "failed", name="emailstatus"), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_email_outbox_id", "email_outbox", ["id"])
+    op.create_index("ix_email_outbox_status_next_attempt_at", "email_outbox", ["status", "next_attempt_at"])
+
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.LargeBinary(), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "key"),
+    )
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("idempotency_keys")
+    op.drop_table("email_outbox")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS emailstatus")
+
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+    with op.batch_alter_table("order_items") as batch_op:  # SQLite can't drop columns in place
+        batch_op.drop_column("product_image_url")
+        batch_op.drop_column("product_name")
+
+    op.drop_index("ix_orders_created_at", table_name="orders")
+    op.drop_index("ix_orders_user_id_created_at", table_name="orders")
+
+    op.drop_table("product_stock_shards")
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_index("ix_products_name_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
+    op.drop_index("ix_products_category_name", table_name="products")
+    op.drop_index("ix_products_category_price", table_name="products")
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("stock_shards")
@@ -0,0 +1,65 @@
+"""Daily sales rollups for admin reports
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "shard"),
+    )
+    op.create_table(
+        "sales_daily_product",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(), nullable=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "product_id", "shard"),  # Date-range reports scan it by day
+    )
+    # Backfill from existing orders so reports are complete straight away
+    op.execute(
+        "INSERT INTO sales_daily (day, shard, orders, units, revenue) "
+        "SELECT date(orders.created_at), 0, count(DISTINCT orders.id), sum(order_items.quantity), "
+        "sum(order_items.quantity * order_items.price_at_purchase) "
+        "FROM orders JOIN order_items ON order_items.order_id = orders.id "
+        "WHERE orders.status = 'paid' AND order_items.product_id IS NOT NULL "
+        "GROUP BY date(orders.created_at)"
+    )
+    op.execute(
+        "INSERT INTO sales_daily_product (day, product_id, shard, category, units, revenue) "
+        "SELECT date(orders.created_at), order_items.product_id, 0, max(products.category), sum(order_items.quantity), "
+        "sum(order_items.quantity * order_items.price_at_purchase) "
+        "FROM orders JOIN order_items ON order_items.order_id = orders.id "
+        "LEFT OUTER JOIN products ON products.id = order_items.product_id "
+        "WHERE orders.status = 'paid' AND order_items.product_id IS NOT NULL "
+        "GROUP BY date(orders.created_at), order_items.product_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("sales_daily_product")
+    op.drop_table("sales_daily")
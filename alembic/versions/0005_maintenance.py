@@ -0,0 +1,48 @@
+"""Maintenance jobs: leases, cart activity and reset token expiry indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 19:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "maintenance_leases",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("owner", sa.String(length=128), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Existing cart rows count as touched now, so nothing is purged until it has really sat for CART_STALE_DAYS.
+    # Added nullable and tightened afterwards: SQLite can't ADD COLUMN with a non-constant default.
+    op.add_column("cart", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE cart SET updated_at = CURRENT_TIMESTAMP")
+    with op.batch_alter_table("cart") as batch_op:
+        batch_op.alter_column("updated_at", existing_type=sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now())
+    op.create_index("ix_cart_updated_at", "cart", ["updated_at"])
+
+    op.create_index("ix_password_reset_tokens_expiration_time", "password_reset_tokens", ["expiration_time"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_password_reset_tokens_expiration_time", table_name="password_reset_tokens")
+    op.drop_index("ix_cart_updated_at", table_name="cart")
+    with op.batch_alter_table("cart") as batch_op:
+        batch_op.drop_column("updated_at")
+    op.drop_table("maintenance_leases")
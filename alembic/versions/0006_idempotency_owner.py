@@ -0,0 +1,29 @@
+"""Owner token on idempotency key claims
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 20:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("idempotency_keys", sa.Column("owner", sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("idempotency_keys") as batch_op:
+        batch_op.drop_column("owner")
@@ -0,0 +1,18 @@
+# bcrypt work executed inside the password hashing process pool (see PasswordHasher in app.auth.utils).
+# Kept free of app imports so spawned worker processes start quickly and without settings.
+from functools import lru_cache
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def password_context(rounds: int) -> CryptContext:  # Hashes below the configured cost are marked deprecated
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return password_context(rounds).hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return password_context(rounds).verify_and_update(plain_password, hashed_password)  # (valid, replacement hash or None)
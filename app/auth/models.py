@@ -27,8 +27,17 @@ class PasswordResetToken(Base):
   id = Column(Integer, primary_key=True, index=True)
   user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
   token = Column(String, unique=True, index=True, default=lambda: str(uuid.uuid4()))
-  expiration_time = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc) + timedelta(minutes=30))
+  expiration_time = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc) + timedelta(minutes=30), index=True)  # Purge of expired tokens
   used = Column(Boolean, default=False)
 
   user = relationship("User")
-  
\ No newline at end of file
+  
+
+# Revoked refresh/access tokens, loaded into app.auth.revocation.revocation_list so checks never hit the DB.
+# jti is either a token's own id or a session id (sid), which revokes every token issued to that session.
+class RevokedToken(Base):
+  __tablename__ = "revoked_tokens"
+
+  jti = Column(String(64), primary_key=True)
+  expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Latest exp of any token it covers
+  revoked_at = Column(DateTime(timezone=True), nullable=False, index=True, default=lambda: datetime.now(timezone.utc))  # Incremental sync
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.models import RevokedToken
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, dialect_insert
+from app.core.logger import logger
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):  # Double hashing: k positions out of one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+# In-memory copy of revoked_tokens. The Bloom filter answers the common "not revoked" case in a few bit
+# probes; the exact map (id -> expiry) resolves its false positives and lets expired entries be dropped.
+# Revocations made here apply at once; those from other workers arrive with the next sync.
+class RevocationList:
+    SYNC_OVERLAP_SECONDS = 60  # Re-read this far back: rows commit a little after their revoked_at, clocks drift
+
+    def __init__(self, capacity: int, error_rate: float, sync_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.synced_at = None  # Start of the last successful sync, None until the initial full load
+        self.syncs = 0
+        self.sync_errors = 0
+        self.false_positives = 0
+        self._expiry: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._task = None
+
+    def add(self, token_id: str, expires_at: float):
+        self._expiry[token_id] = max(expires_at, self._expiry.get(token_id, 0))
+        if len(self._expiry) > self.capacity:  # Past its capacity the filter's error rate climbs, grow it
+            self.capacity *= 2
+            self._rebuild()
+        else:
+            self._bloom.add(token_id)
+
+    def is_revoked(self, *token_ids: Optional[str]) -> bool:
+        for token_id in token_ids:
+            if token_id and token_id in self._bloom:
+                if token_id in self._expiry:
+                    return True
+                self.false_positives += 1
+        return False
+
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for token_id in self._expiry:
+            bloom.add(token_id)
+        self._bloom = bloom
+
+    def prune(self):  # Expired tokens are rejected by their exp claim anyway
+        now = time.time()
+        expired = [token_id for token_id, expires_at in self._expiry.items() if expires_at <= now]
+        for token_id in expired:
+            del self._expiry[token_id]
+        if expired:
+            self._rebuild()
+
+    async def sync(self):  # Loads rows added since the last sync, by this or any other worker
+        started = datetime.now(timezone.utc)
+        query = select(RevokedToken.jti, RevokedToken.expires_at).filter(RevokedToken.expires_at > started)
+        if self.synced_at is not None:
+            query = query.filter(RevokedToken.revoked_at > self.synced_at - timedelta(seconds=self.SYNC_OVERLAP_SECONDS))
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+        for row in rows:
+            self.add(row.jti, _timestamp(row.expires_at))
+        self.synced_at = started
+        self.syncs += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+                self.prune()
+            except Exception:  # Keep serving with the entries we have, the next sync catches up
+                self.sync_errors += 1
+                logger.warning("Token revocation sync failed", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._expiry),
+            "bloom_bits": self._bloom.size,
+            "false_positives": self.false_positives,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+        }
+
+
+revocation_list = RevocationList(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE, settings.REVOCATION_SYNC_INTERVAL_SECONDS)
+
+
+def _timestamp(value: datetime) -> float:  # SQLite hands back naive datetimes, stored as UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def session_expiry() -> datetime:  # No token of a session issued until now outlives this
+    return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+# Commits the revocation, then applies it to this worker's list. Returns False when the id was already
+# revoked, which for a refresh token means it is being replayed. The insert is the atomic step: of two
+# concurrent refreshes with the same token only one gets True.
+async def revoke(db: AsyncSession, token_id: str, expires_at: datetime) -> bool:
+    insert = dialect_insert(db.bind.dialect.name)
+    result = await db.execute(
+        insert(RevokedToken).values(jti=token_id, expires_at=expires_at).on_conflict_do_nothing(index_elements=["jti"])
+    )
+    await db.commit()
+    revocation_list.add(token_id, expires_at.timestamp())
+    return result.rowcount == 1
+
+
+async def purge_expired_revocations() -> int:  # Maintenance job (app.maintenance)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(RevokedToken).filter(RevokedToken.expires_at <= datetime.now(timezone.utc)))
+        await db.commit()
+    return result.rowcount
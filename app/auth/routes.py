@@ -1,14 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
-from app.core.config import settings
 from app.auth.schemas import ResetPasswordRequest, UserCreate, UserLogin, TokenResponse, ForgotPasswordRequest, RefreshTokenRequest
 from app.auth.models import User, PasswordResetToken
-from app.auth.utils import hash_password, verify_password, create_access_token, create_refresh_token, require_role
-from app.core.database import get_db
-from app.core.email import send_email
+from app.auth.revocation import revocation_list, revoke, session_expiry
+from app.auth.utils import hash_password, verify_password, create_token_pair, decode_token, require_role, verify_token
+from app.core.database import get_async_db
+from app.core.email import enqueue_email, outbox_worker
 from app.core.logger import logger  
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -17,11 +17,11 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/signin")
 
 # Sign-up using email, password & role
 @router.post("/signup")
-def signup(request: UserCreate, db: Session = Depends(get_db)):
-    logger.info(f"Signup attempt: {request.email}")
-    existing_user = db.query(User).filter(User.email == request.email).first()
+async def signup(request: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Signup attempt: %s", request.email)
+    existing_user = await db.scalar(select(User).filter(User.email == request.email))
     if existing_user:
-        logger.warning(f"Signup failed - Email already registered: {request.email}")
+        logger.warning("Signup failed - Email already registered: %s", request.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered."
@@ -30,33 +30,37 @@ def signup(request: UserCreate, db: Session = Depends(get_db)):
     new_user = User(
         name=request.name,
         email=request.email,
-        hashed_password=hash_password(request.password),
+        hashed_password=await hash_password(request.password),  # Runs on the password hashing process pool
         role=request.role
     )
     db.add(new_user)
 
-    logger.info(f"User created successfully: {request.email}")
-    db.commit()
-    db.refresh(new_user)
+    logger.info("User created successfully: %s", request.email)
+    await db.commit()
     return {"message": "User created successfully. Please sign in."}
 
 
 # Sign-in using unique email
 @router.post("/signin", response_model=TokenResponse)
-def signin(request: UserLogin, db: Session = Depends(get_db)):
-    logger.info(f"Signin attempt: {request.email}")
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.hashed_password):
-        logger.warning(f"Signin failed for: {request.email}")
+async def signin(request: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Signin attempt: %s", request.email)
+    user = await db.scalar(select(User).filter(User.email == request.email))
+    valid, upgraded_hash = await verify_password(request.password, user.hashed_password) if user else (False, None)
+    if not valid:
+        logger.warning("Signin failed for: %s", request.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials."
         )
 
-    access_token = create_access_token({"sub": user.email, "role": user.role})
-    refresh_token = create_refresh_token({"sub": user.email})
+    if upgraded_hash:  # Stored hash used an outdated cost / scheme, replace it while we have the password
+        user.hashed_password = upgraded_hash
+        await db.commit()
+        logger.info("Password hash upgraded for: %s", request.email)
 
-    logger.info(f"Signin successful for: {request.email}")
+    access_token, refresh_token = create_token_pair(user.email, user.role)
+
+    logger.info("Signin successful for: %s", request.email)
     return TokenResponse(
         access_token=access_token,
         refresh_token=refresh_token,
@@ -66,17 +70,17 @@ def signin(request: UserLogin, db: Session = Depends(get_db)):
 
 # Forget password, get reset password link on your mail
 @router.post("/forgot-password")
-def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    logger.info(f"Forgot password request for: {request.email}")
-    user = db.query(User).filter(User.email == request.email).first()
+async def forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Forgot password request for: %s", request.email)
+    user = await db.scalar(select(User).filter(User.email == request.email))
     if not user:
-        logger.warning(f"Forgot password - Email not found: {request.email}")
+        logger.warning("Forgot password - Email not found: %s", request.email)
         raise HTTPException(status_code=404, detail="Email not found")
 
     reset_token = PasswordResetToken(user_id=user.id)  # Generate reset token
     db.add(reset_token)  # Reset token stored in DB
-    logger.debug(f"Password reset token generated for {request.email}: {reset_token.token}")
-    db.commit()
+    await db.flush()  # so we get reset_token.token
+    logger.debug("Password reset token generated for %s: %s", request.email, reset_token.token)
 
     # Create reset password link 
     reset_link = f"http://localhost:8000/auth/reset-password-form?token={reset_token.token}"
@@ -86,52 +90,69 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
     <a href="{reset_link}">{reset_link}</a>
     <p>This link will expire in 30 minutes.</p>
     """
-    send_email(user.email, "Reset your password", body)  # Send email on user-email for creating new password
+    enqueue_email(db, user.email, "Reset your password", body)  # Queued in the same transaction as the token
+    await db.commit()
+    outbox_worker.notify()  # Delivered in the background by the outbox worker
 
-    logger.info(f"Reset email sent to {request.email}")
+    logger.info("Reset email queued for %s", request.email)
     return {"message": "Password reset link sent to your email.", "token": reset_token.token}
 
 
 # Create new password, Update DB
 @router.post("/reset-password")
-def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
-    logger.info(f"Reset password attempt using token: {request.token}")
-    token_record = db.query(PasswordResetToken).filter(PasswordResetToken.token == request.token).first()
+async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Reset password attempt using token: %s", request.token)
+    token_record = await db.scalar(select(PasswordResetToken).filter(PasswordResetToken.token == request.token))
 
     if not token_record:
-        logger.warning(f"Reset failed - Invalid token: {request.token}")
+        logger.warning("Reset failed - Invalid token: %s", request.token)
         raise HTTPException(status_code=404, detail="Invalid token")
     elif token_record.used or token_record.expiration_time.replace(tzinfo=timezone.utc) < datetime.now(timezone.utc):
-        logger.warning(f"Reset failed - Token expired or already used: {request.token}")
+        logger.warning("Reset failed - Token expired or already used: %s", request.token)
         raise HTTPException(status_code=400, detail="Token expired or already used")
 
-    user = db.query(User).filter(User.id == token_record.user_id).first()
-    user.hashed_password = hash_password(request.new_password)
+    user = await db.get(User, token_record.user_id)
+    user.hashed_password = await hash_password(request.new_password)
     token_record.used = True
-    db.commit()
+    await db.commit()
     
-    logger.info(f"Password successfully reset for user ID: {token_record.user_id}")
+    logger.info("Password successfully reset for user ID: %s", token_record.user_id)
     return {"message": "Password has been reset successfully."}
 
 
 # Refresh token regenerates access token after it expires
+# Rotation: each refresh token works once and is exchanged for a new pair in the same session.
+# Presenting an already used one means it leaked, so the whole session is revoked.
 @router.post("/refresh", response_model=TokenResponse)
-def refresh_token(request: RefreshTokenRequest):
-    try:
-        payload = jwt.decode(request.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = payload.get("sub")
-        role = payload.get("role")
-
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
-
-    new_access_token = create_access_token({"sub": email, "role": role})
-
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    payload = verify_token(request.refresh_token, "refresh")  # A revoked jti is handled below as reuse
+    email, session_id = payload.get("sub"), payload.get("sid")
+    if not email or not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if revocation_list.is_revoked(session_id):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    if not await revoke(db, payload["jti"], datetime.fromtimestamp(payload["exp"], timezone.utc)):
+        if session_id:
+            await revoke(db, session_id, session_expiry())
+        logger.warning("Refresh token reuse for %s, session revoked", email)
+        raise HTTPException(status_code=401, detail="Refresh token already used, please sign in again")
+
+    access_token, new_refresh_token = create_token_pair(email, payload.get("role"), session_id)
     return TokenResponse(
-        access_token=new_access_token,
-        refresh_token=request.refresh_token,
+        access_token=access_token,
+        refresh_token=new_refresh_token,
         token_type="bearer"
     )
+
+
+# Sign-out: revokes the session, so its access and refresh tokens stop working on every worker
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    payload = decode_token(token)
+    if payload.get("sid"):
+        await revoke(db, payload["sid"], session_expiry())
+    elif payload.get("jti"):
+        await revoke(db, payload["jti"], datetime.fromtimestamp(payload["exp"], timezone.utc))
+    logger.info("Signed out: %s", payload.get("sub"))
+    return {"message": "Signed out successfully."}
@@ -1,32 +1,119 @@
-from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.auth import hashing
 from app.auth.models import User
-from app.core.database import SessionLocal
+from app.auth.revocation import revocation_list
+from app.core.cache import TTLCache
+from app.core.database import get_async_db, read_session, user_key
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/signin")  # extracts the token string from the header
 
+# Verified token payloads (token -> payload) and resolved principals (email -> detached User)
+token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+principal_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
 
 # Password hashing
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# bcrypt runs on a dedicated process pool so login bursts use other cores instead of holding
+# the GIL of the API worker. Calls beyond the pool wait on a semaphore; past PASSWORD_HASH_MAX_QUEUE
+# waiting calls the request is shed with 503 rather than piling up.
+class PasswordHasher:
+
+    def __init__(self, workers: int, max_queue: int, rounds: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+        self._executor = None
+        self._semaphore = None  # Created in start(), on the loop that will use it
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    async def _run(self, fn, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+        self.start()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.wait_seconds_total += started_at - queued_at
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args, self.rounds)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_seconds_total += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hashing.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(hashing.verify_password, plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "run_seconds_total": self.run_seconds_total,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE, settings.BCRYPT_ROUNDS)
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:  # (valid, upgraded hash or None)
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
 # Token creation
+# Every token carries a unique jti and its type; tokens from one sign-in share a session id (sid),
+# so revoking the sid ends the whole session (see app.auth.revocation).
 def create_access_token(data: dict, expires_minutes: int = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 def create_refresh_token(data: dict, expires_days: int = None):
@@ -34,18 +121,79 @@ def create_refresh_token(data: dict, expires_days: int = None):
     expire = datetime.now(timezone.utc) + timedelta(
         days=expires_days or settings.REFRESH_TOKEN_EXPIRE_DAYS
     )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
+def create_token_pair(email: str, role: str, session_id: str = None) -> Tuple[str, str]:  # (access, refresh) for one session
+    claims = {"sub": email, "role": role, "sid": session_id or uuid.uuid4().hex}
+    return create_access_token(claims), create_refresh_token(claims)
+
 
 # Token decoding 
-def decode_token(token: str):  # extracts user data
-    try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-    except JWTError:
+def verify_token(token: str, token_type: str = "access"):  # Signature, expiry and type, without the revocation check
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        token_cache.set(token, payload, ttl=seconds_until_expiry(payload))
+
+    if payload.get("type") != token_type:  # A refresh token is never a bearer credential, and vice versa
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return payload
+
+def decode_token(token: str, token_type: str = "access"):  # extracts user data
+    payload = verify_token(token, token_type)
+    if revocation_list.is_revoked(payload.get("jti"), payload.get("sid")):  # In memory, also on token cache hits
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    return payload
+
+def user_from_authorization(authorization: Optional[str]) -> Optional[str]:  # Verified subject of a bearer header, or None
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return decode_token(authorization[7:].strip()).get("sub")
+    except HTTPException:
+        return None
+
+def seconds_until_expiry(payload: dict) -> float:  # Cached entries must never outlive the token itself
+    exp = payload.get("exp")
+    if exp is None:
+        return settings.AUTH_CACHE_TTL_SECONDS
+    return exp - datetime.now(timezone.utc).timestamp()
+
+
+# --------------------------------------------------------------------------------------------------------------
+# Principal cache invalidation
+
+def invalidate_user(email: str):
+    principal_cache.pop(email)
+    token_cache.pop_where(lambda _, payload: payload.get("sub") == email)
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "principals": principal_cache.stats()}
+
+# Emails of changed users are collected at flush and dropped from the caches only once the change is
+# committed: dropping them at flush would let a request in between re-cache the old row. Per process,
+# other workers keep their copy until AUTH_CACHE_TTL_SECONDS runs out.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target: User):  # Password / role / email changes
+    emails = Session.object_session(target).info.setdefault("changed_user_emails", set())
+    emails.add(target.email)
+    emails.update(inspect(target).attrs.email.history.deleted)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session):
+    for email in session.info.pop("changed_user_emails", ()):
+        invalidate_user(email)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session):
+    session.info.pop("changed_user_emails", None)
 
 
 # --------------------------------------------------------------------------------------------------------------
@@ -53,27 +201,31 @@ def decode_token(token: str):  # extracts user data
 
 # 1. Require Specific Role
 def require_role(role: str):  # higher-order function, returns a dependency function
-    def role_dependency(user: User = Depends(get_current_user)) -> User:
+    async def role_dependency(user: User = Depends(get_current_user)) -> User:
         if user.role != role:
             raise HTTPException(status_code=403, detail="You do not have permission to access this resource")
         return user
     return role_dependency
 
 # 2. Get Current User from JWT Token
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    try:
-        payload = decode_token(token)
-        email: str = payload.get("sub")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-        db: Session = SessionLocal()
-        user = db.query(User).filter(User.email == email).first()
-        db.close()
-        if user is None:
-            raise HTTPException(status_code=404, detail="User not found")
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+    payload = decode_token(token)
+    email: str = payload.get("sub")
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = principal_cache.get(email)
+    if user is not None:
         return user
 
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
\ No newline at end of file
+    user = await db.scalar(select(User).filter(User.email == email))  # Reuses the request's session on a cache miss
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db.expunge(user)  # Detach, so later commits in this request never expire the shared cached instance
+    principal_cache.set(email, user, ttl=seconds_until_expiry(payload))
+    return user
+
+# 3. Read-only session for the current user's own data: the replica, unless they wrote recently
+async def get_user_read_db(user: User = Depends(get_current_user)):
+    async with read_session(user_key(user.id))() as db:
+        yield db
@@ -0,0 +1,16 @@
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# GET /cart/summary per user id. Kept per worker with a short TTL, so a change made through another
+# worker shows up within CART_SUMMARY_CACHE_TTL_SECONDS.
+cart_summary_cache = TTLCache(settings.CART_SUMMARY_CACHE_MAX_ENTRIES, settings.CART_SUMMARY_CACHE_TTL_SECONDS)
+
+
+def invalidate_cart(user_id: int) -> None:
+    cart_summary_cache.pop(user_id)
+
+
+def invalidate_carts_with_products(*product_ids: int) -> None:  # Price / stock changes show up in other users' summaries
+    ids = set(product_ids)
+    if ids:
+        cart_summary_cache.pop_where(lambda user_id, summary: any(line.product_id in ids for line in summary.items))
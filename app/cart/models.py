@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, DateTime, Integer, ForeignKey, UniqueConstraint, func
 from app.core.database import Base
 from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
 
 class Cart(Base):
     __tablename__ = "cart"
@@ -9,5 +10,9 @@ class Cart(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
+    updated_at = Column(  # Last add / quantity change; carts untouched for CART_STALE_DAYS are purged
+        DateTime(timezone=True), nullable=False, index=True, server_default=func.now(),
+        default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc),
+    )
 
     __table_args__ = (UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),)  # Ensures a user can’t have the same product in cart multiple times
\ No newline at end of file
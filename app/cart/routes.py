@@ -1,124 +1,221 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from pydantic import TypeAdapter
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import dialect_insert, get_async_db, mark_recent_write, user_key
+from app.core.idempotency import IDEMPOTENCY_HEADER, run_idempotent
 from app.core.logger import logger
+from app.core.serialization import RowSerializer, json_response
 from app.auth.utils import get_current_user, require_role
 from app.auth.models import User
+from app.cart.cache import cart_summary_cache, invalidate_cart
 from app.cart.models import Cart
-from app.cart.schemas import CartItemOut, CartItemCreate, CartItemUpdate
+from app.cart.schemas import CartBatchUpdate, CartItemOut, CartItemCreate, CartItemUpdate, CartLineOut, CartSummary
 from app.products.models import Product
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
-# Add item to cart
+CART_ITEM = TypeAdapter(CartItemOut)
+CART_ITEMS = RowSerializer(CartItemOut, many=True)
+
+
+# Stock of every requested product in one query. Raises on the first problem, before anything is written.
+async def check_stock(db: AsyncSession, quantities: Dict[int, int]) -> None:
+    rows = (await db.execute(
+        select(Product.id, Product.name, Product.available_stock).filter(Product.id.in_(quantities))
+    )).all()
+    products = {row.id: row for row in rows}
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            logger.warning("Product not found: ID %s", product_id)
+            raise HTTPException(status_code=404, detail=f"Product ID {product_id} not found")
+        if product.available_stock == 0:  # Can't add product to cart, if don't have enough stock
+            logger.warning("Out of stock: Product %s (ID %s)", product.name, product_id)
+            raise HTTPException(status_code=400, detail=f"Product '{product.name}' is out of stock.")
+        if quantity > product.available_stock:
+            logger.warning("Requested quantity %s exceeds stock %s for product %s", quantity, product.available_stock, product.name)
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot add {quantity} units of '{product.name}' to cart. Only {product.available_stock} left in stock."
+            )
+
+
+# One INSERT ... ON CONFLICT over _user_product_uc for all lines: a new line is inserted, an existing one gets
+# the quantity added (add=True) or replaced. Atomic, so two concurrent adds can't both try to insert the line.
+def upsert_lines(dialect_name: str, user_id: int, quantities: Dict[int, int], add: bool):
+    insert = dialect_insert(dialect_name)
+    now = datetime.now(timezone.utc)
+    statement = insert(Cart).values([  # Product id order, concurrent batches of one user lock the rows in the same order
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity, "updated_at": now}
+        for product_id, quantity in sorted(quantities.items())
+    ])
+    quantity = Cart.quantity + statement.excluded.quantity if add else statement.excluded.quantity
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "product_id"],
+        set_={"quantity": quantity, "updated_at": statement.excluded.updated_at},  # onupdate doesn't apply to upserts
+    )
+
+
+# Add item to cart. A retry with the same Idempotency-Key doesn't add the quantity a second time.
 @router.post("/", response_model=CartItemOut)
-def add_to_cart(
+async def add_to_cart(
     item: CartItemCreate,
-    db: Session = Depends(get_db),
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("user"))
 ):
-    logger.info(f"[{current_user.email}] → POST /cart → Adding product {item.product_id} x {item.quantity}")
-
-    product = db.query(Product).filter(Product.id == item.product_id).first()
-    if not product:
-        logger.warning(f"Product not found: ID {item.product_id}")
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    if product.stock == 0:  # Can't add product to cart, if don't have enough stock
-        logger.warning(f"Out of stock: Product {product.name} (ID {item.product_id})")
-        raise HTTPException(
-            status_code=400,
-            detail=f"Product is out of stock."
-        )
-    
-    if item.quantity > product.stock:
-        logger.warning(f"Requested quantity {item.quantity} exceeds stock {product.stock} for product {product.name}")
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot add {item.quantity} units to cart. Only {product.stock} left in stock."
-        )
-
-    cart_item = db.query(Cart).filter_by(
-        user_id=current_user.id,
-        product_id=item.product_id
-    ).first()
-
-    if cart_item:  # If item already exist in cart, just increase the quantity
-        logger.debug(f"Existing cart item found. Increasing quantity from {cart_item.quantity} to {cart_item.quantity + item.quantity}")
-        cart_item.quantity += item.quantity
-    else:
-        logger.debug(f"Creating new cart item for product {item.product_id}")
-        cart_item = Cart(
-            user_id=current_user.id,
-            product_id=item.product_id,
-            quantity=item.quantity
-        )
-        db.add(cart_item)
-
-    db.commit()
-    logger.info(f"[{current_user.email}] - Cart updated successfully for product {item.product_id}")
-    db.refresh(cart_item)
+    return await run_idempotent(request, db, current_user.id, idempotency_key, CART_ITEM, lambda record: add_item(item, db, current_user, record), item)
+
+
+async def add_item(item: CartItemCreate, db: AsyncSession, current_user: User, record):
+    logger.info("[%s] → POST /cart → Adding product %s x %s", current_user.email, item.product_id, item.quantity)
+    await check_stock(db, {item.product_id: item.quantity})
+
+    # If item already exist in cart, the upsert just increases the quantity
+    cart_item = (await db.execute(
+        upsert_lines(db.bind.dialect.name, current_user.id, {item.product_id: item.quantity}, add=True)
+        .returning(Cart.id, Cart.product_id, Cart.quantity)
+    )).one()
+    await record(cart_item)
+    await db.commit()
+    mark_recent_write(user_key(current_user.id))
+    invalidate_cart(current_user.id)
+    logger.info("[%s] - Cart updated successfully for product %s", current_user.email, item.product_id)
     return cart_item
 
 
 # View all items in cart
 @router.get("/", response_model=list[CartItemOut])
-def view_cart(db: Session = Depends(get_db), current_user: User = Depends(require_role("user"))):
-    logger.info(f"[{current_user.email}] - Viewing cart")
-    return db.query(Cart).filter_by(user_id=current_user.id).all()
+async def view_cart(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(require_role("user"))):
+    logger.info("[%s] - Viewing cart", current_user.email)
+    rows = (await db.execute(select(Cart.id, Cart.product_id, Cart.quantity).filter_by(user_id=current_user.id))).all()
+    return json_response(CART_ITEMS, rows)
+
+
+# Cart lines with product details and totals, from one JOIN instead of a product lookup per line
+@router.get("/summary", response_model=CartSummary)
+async def cart_summary(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(require_role("user"))):
+    logger.info("[%s] - Viewing cart summary", current_user.email)
+    summary = cart_summary_cache.get(current_user.id)
+    if summary is not None:
+        return summary
+
+    rows = (await db.execute(
+        select(
+            Cart.product_id, Cart.quantity,
+            Product.name, Product.price, Product.image_url, Product.available_stock.label("stock"),
+            (Product.price * Cart.quantity).label("line_total"),
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .filter(Cart.user_id == current_user.id)
+        .order_by(Cart.id)
+    )).all()
+
+    items = [
+        CartLineOut(
+            product_id=row.product_id, name=row.name, price=row.price, image_url=row.image_url,
+            stock=row.stock, quantity=row.quantity, line_total=row.line_total,
+            in_stock=row.stock > 0, quantity_available=row.stock >= row.quantity,
+        )
+        for row in rows
+    ]
+    summary = CartSummary(
+        items=items,
+        item_count=len(items),
+        total_quantity=sum(item.quantity for item in items),
+        subtotal=round(sum(item.line_total for item in items), 2),
+        checkout_ready=bool(items) and all(item.quantity_available for item in items),
+    )
+    cart_summary_cache.set(current_user.id, summary)
+    return summary
+
+
+# Set the quantities of many lines at once (e.g. restoring a saved cart), 0 removes a line. Stock is checked
+# for all products with one query and every change is applied in one transaction: all of it or nothing.
+@router.put("/batch", response_model=List[CartItemOut])
+async def update_cart_batch(
+    batch: CartBatchUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("user"))
+):
+    logger.info("[%s] - Batch cart update of %s line(s)", current_user.email, len(batch.items))
+    quantities = {item.product_id: item.quantity for item in batch.items if item.quantity}
+    removed = [item.product_id for item in batch.items if not item.quantity]
+
+    if quantities:
+        await check_stock(db, quantities)
+        await db.execute(upsert_lines(db.bind.dialect.name, current_user.id, quantities, add=False))
+    if removed:
+        await db.execute(delete(Cart).filter(Cart.user_id == current_user.id, Cart.product_id.in_(removed)))
+    await db.commit()
+    mark_recent_write(user_key(current_user.id))
+    invalidate_cart(current_user.id)
+    logger.info("[%s] - Cart batch applied: %s set, %s removed", current_user.email, len(quantities), len(removed))
+
+    rows = (await db.execute(select(Cart.id, Cart.product_id, Cart.quantity).filter_by(user_id=current_user.id))).all()
+    return json_response(CART_ITEMS, rows)  # The whole cart as it now is
 
 
 # Update quantity of item in cart
 @router.put("/{product_id}", response_model=CartItemOut)
-def update_quantity(
+async def update_quantity(
     product_id: int, 
     update: CartItemUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(require_role("user"))
     ):
-    logger.info(f"[{current_user.email}] - Updating cart item: Product ID {product_id} to quantity {update.quantity}")
-    cart_item = db.query(Cart).filter_by(
+    logger.info("[%s] - Updating cart item: Product ID %s to quantity %s", current_user.email, product_id, update.quantity)
+    cart_item = await db.scalar(select(Cart).filter_by(
         user_id=current_user.id,
         product_id=product_id
-    ).first()
+    ))
 
     if not cart_item:
-        logger.warning(f"Cart item not found for user {current_user.email} and product ID {product_id}")
+        logger.warning("Cart item not found for user %s and product ID %s", current_user.email, product_id)
         raise HTTPException(status_code=404, detail="Item not found")
 
     if update.quantity == 0:
-        db.delete(cart_item)
-        db.commit()
-        logger.info(f"Removing item from cart (quantity set to 0): Product ID {product_id}")
+        await db.delete(cart_item)
+        await db.commit()
+        mark_recent_write(user_key(current_user.id))
+        invalidate_cart(current_user.id)
+        logger.info("Removing item from cart (quantity set to 0): Product ID %s", product_id)
         return JSONResponse(content={"detail": "Item removed from cart"}, status_code=status.HTTP_200_OK)
     else:
         cart_item.quantity = update.quantity
-        db.commit()
-        db.refresh(cart_item)
-        logger.debug(f"Cart quantity updated to {update.quantity} for product ID {product_id}")
+        await db.commit()
+        mark_recent_write(user_key(current_user.id))
+        invalidate_cart(current_user.id)
+        logger.debug("Cart quantity updated to %s for product ID %s", update.quantity, product_id)
         return cart_item
 
 
 # Remove item from cart
 @router.delete("/{product_id}")
-def remove_item(
+async def remove_item(
     product_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(require_role("user"))
 ):
-    logger.info(f"[{current_user.email}] - Removing item from cart: Product ID {product_id}")
-    cart_item = db.query(Cart).filter_by(
+    logger.info("[%s] - Removing item from cart: Product ID %s", current_user.email, product_id)
+    cart_item = await db.scalar(select(Cart).filter_by(
         user_id=current_user.id,
         product_id=product_id
-    ).first()
+    ))
 
     if not cart_item:
-        logger.warning(f"Cart item not found for deletion: Product ID {product_id}")
+        logger.warning("Cart item not found for deletion: Product ID %s", product_id)
         raise HTTPException(status_code=404, detail="Item not found")
 
-    db.delete(cart_item)
-    db.commit()
-    logger.info(f"Item removed from cart: Product ID {product_id}")
+    await db.delete(cart_item)
+    await db.commit()
+    mark_recent_write(user_key(current_user.id))
+    invalidate_cart(current_user.id)
+    logger.info("Item removed from cart: Product ID %s", product_id)
     return {"message": "Item removed from cart"}
@@ -1,6 +1,6 @@
 from fastapi import Path
 from pydantic import BaseModel, Field, model_validator
-from typing import Optional
+from typing import List, Optional
 
 class CartItemCreate(BaseModel):
     product_id: int
@@ -15,6 +15,19 @@ class CartItemCreate(BaseModel):
 class CartItemUpdate(BaseModel):
     quantity: int = Field(..., ge=0)
 
+class CartBatchItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., ge=0)  # New quantity of the line, 0 removes it
+
+class CartBatchUpdate(BaseModel):
+    items: List[CartBatchItem] = Field(..., min_length=1, max_length=200)
+
+    @model_validator(mode="after")
+    def check_unique_products(cls, values):
+        if len({item.product_id for item in values.items}) != len(values.items):
+            raise ValueError("Each product may appear only once")
+        return values
+
 class CartItemOut(BaseModel):
     id: int = Path(..., ge = 1)
     product_id: int
@@ -22,3 +35,24 @@ class CartItemOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+class CartLineOut(BaseModel):
+    product_id: int
+    name: str
+    price: float
+    image_url: Optional[str] = None
+    stock: int
+    quantity: int
+    line_total: float
+    in_stock: bool  # Product has any stock left
+    quantity_available: bool  # Enough stock for the quantity in the cart, checkout would succeed for this line
+
+    class Config:
+        from_attributes = True
+
+class CartSummary(BaseModel):
+    items: List[CartLineOut]
+    item_count: int
+    total_quantity: int
+    subtotal: float
+    checkout_ready: bool  # Non-empty and every line is available
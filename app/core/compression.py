@@ -0,0 +1,120 @@
+import zlib
+from collections import Counter, defaultdict
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:  # Optional: without it only gzip is offered
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+compression_stats = defaultdict(Counter)  # encoding -> responses / bytes_in / bytes_out, for /metrics
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:  # Highest q-value the client accepts, br wins ties
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in offered:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _Compressor:  # One streaming compressor per response, same interface for both encodings
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+# Pure ASGI middleware: gzip / brotli for JSON and text bodies of at least `minimum_size` bytes,
+# chosen from Accept-Encoding. Streamed bodies (exports) are compressed chunk by chunk.
+# Registered innermost, so response caching and rate limiting above it see the plain response.
+class CompressionMiddleware:
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None  # Held back until the first body chunk shows whether compressing pays off
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                eligible = (
+                    start["status"] not in (204, 304)
+                    and "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if eligible:
+                    compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):  # Bytes differ from the identity body, the validator no longer is strong
+                        headers["ETag"] = f"W/{etag}"
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    compression_stats[encoding]["responses"] += 1
+                    if not more_body:
+                        compressed = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(compressed))
+                        compression_stats[encoding]["bytes_in"] += len(body)
+                        compression_stats[encoding]["bytes_out"] += len(compressed)
+                        await send(start)
+                        start = None
+                        return await send({"type": "http.response.body", "body": compressed})
+                else:
+                    compression_stats["identity"]["responses"] += 1  # Too small, not compressible or already encoded
+                await send(start)
+                start = None
+
+            if compressor is None:
+                return await send(message)
+            compressed = compressor.compress(body)
+            if not more_body:
+                compressed += compressor.finish()
+            compression_stats[encoding]["bytes_in"] += len(body)
+            compression_stats[encoding]["bytes_out"] += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,8 +1,21 @@
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL when not set
+    REPLICA_DATABASE_URL: Optional[str] = None  # Read-only replica for catalog and order history reads, unset = primary
+    READ_YOUR_WRITES_SECONDS: float = 5  # After a write, that user's (or the catalog's) reads stay on the primary this long
+
+    # Connection pool tuning (ignored for SQLite)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 disables the server-side statement timeout (PostgreSQL only)
+    DB_AUTO_MIGRATE: bool = True  # Run `alembic upgrade head` on startup, disable when deploys migrate separately
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
@@ -12,6 +25,96 @@ class Settings(BaseSettings):
     EMAIL_PORT: int
     EMAIL_USERNAME: str
     EMAIL_PASSWORD: str
+    EMAIL_USE_TLS: bool = True  # STARTTLS before login, disable for the local stand-in (python -m app.core.smtp_stub)
+    EMAIL_TIMEOUT_SECONDS: int = 10
+    EMAIL_CONNECTION_IDLE_SECONDS: int = 60  # Reuse an authenticated connection for this long between messages
+
+    OUTBOX_ENABLED: bool = True  # Run the delivery worker in this process
+    OUTBOX_WORKER_THREADS: int = 1  # Each thread keeps its own SMTP connection
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: int = 30  # Doubles after every failed attempt
+    OUTBOX_RETRY_MAX_SECONDS: int = 3600
+    OUTBOX_CLAIM_SECONDS: int = 300  # A claimed message is retried after this if its worker died mid-send
+
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_DIR: str = "logs"
+    LOG_FILE: str = "app.log"
+    LOG_ROTATION: str = "size"  # "size" (LOG_MAX_BYTES) or "time" (LOG_ROTATE_WHEN)
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_ROTATE_WHEN: str = "midnight"
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped rather than blocking requests
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # Fraction of DEBUG records kept when LOG_LEVEL=DEBUG
+
+    MAX_PAGINATION_OFFSET: int = 1000  # Deep pages must use the cursor instead of skip
+
+    PRODUCT_IMPORT_BATCH_SIZE: int = 1000  # Rows per INSERT / commit during bulk import
+    PRODUCT_IMPORT_MAX_REPORTED_ERRORS: int = 1000  # Invalid rows past this are counted but not listed
+    PRODUCT_EXPORT_CHUNK_SIZE: int = 1000  # Rows fetched from the server-side cursor per chunk
+
+    BCRYPT_ROUNDS: int = 12  # Raising it rehashes existing passwords on their next successful login
+    PASSWORD_HASH_WORKERS: int = 2  # Processes dedicated to bcrypt, per API worker
+    PASSWORD_HASH_MAX_QUEUE: int = 100  # Waiting hash/verify calls beyond this get a 503
+
+    AUTH_CACHE_MAX_ENTRIES: int = 10000  # Verified tokens / resolved users kept in memory
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Upper bound, entries never outlive the token's exp. Also how long other workers may keep a changed role
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 5  # How quickly a revocation made by another worker takes effect here
+    REVOCATION_BLOOM_CAPACITY: int = 100000  # Revoked ids the filter is sized for, it is rebuilt larger when exceeded
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_PURGE_INTERVAL_SECONDS: int = 3600  # Drops rows of revocations whose tokens have expired anyway
+
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048  # Public catalog responses kept per worker
+    RESPONSE_CACHE_TTL_SECONDS: int = 30  # Also sent as Cache-Control max-age
+
+    FACET_PRICE_BUCKETS: List[float] = [0, 10, 25, 50, 100, 250, 500, 1000]  # Lower edges, the last bucket is open-ended
+    FACETS_REFRESH_SECONDS: float = 60  # Full reload, picks up catalog changes served by other workers
+    FACET_CACHE_MAX_ENTRIES: int = 1000  # Keyword-scoped facet results kept per worker
+
+    COMPRESSION_ENABLED: bool = True  # gzip / brotli (when installed) for JSON and text responses, per Accept-Encoding
+    COMPRESSION_MINIMUM_BYTES: int = 1024  # Smaller bodies go out as is, the framing would eat the saving
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11, above ~5 costs more CPU than it saves on the wire for dynamic responses
+
+    CART_SUMMARY_CACHE_MAX_ENTRIES: int = 5000  # Per-user /cart/summary results kept per worker
+    CART_SUMMARY_CACHE_TTL_SECONDS: int = 10
+
+    SALES_ROLLUP_SHARDS: int = 8  # Rows per day in the sales rollups, spreads concurrent checkouts; changing it needs no rebuild
+    REPORT_MAX_DAYS: int = 366  # Widest date range a report accepts
+
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60  # How long a stored response is replayed for its key
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # In-flight claim lifetime, longer than any checkout should take
+    IDEMPOTENCY_WAIT_SECONDS: float = 10  # A duplicate waits this long for the in-flight request, then gets a 409
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 300
+
+    # Periodic maintenance jobs (app/maintenance.py). Purges and ANALYZE run on one worker per interval
+    MAINTENANCE_ENABLED: bool = True
+    MAINTENANCE_JITTER: float = 0.1  # Each run is moved by up to this share of its interval
+    MAINTENANCE_DELETE_BATCH_SIZE: int = 1000  # Rows per DELETE transaction
+    RESET_TOKEN_PURGE_INTERVAL_SECONDS: int = 3600  # Expired and used password reset tokens
+    CART_STALE_DAYS: int = 30  # Carts with no line touched for this long are deleted
+    CART_PURGE_INTERVAL_SECONDS: int = 6 * 60 * 60
+    PRODUCT_WARMUP_INTERVAL_SECONDS: float = 25  # Every worker; just under RESPONSE_CACHE_TTL_SECONDS keeps the best sellers cached
+    PRODUCT_WARMUP_COUNT: int = 50  # Best sellers of the last PRODUCT_WARMUP_DAYS by units
+    PRODUCT_WARMUP_DAYS: int = 7
+    ANALYZE_INTERVAL_SECONDS: int = 6 * 60 * 60  # Planner statistics refresh of the hot tables
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "sqlite"  # "sqlite": buckets shared by every worker on the host, "memory": per process
+    RATE_LIMIT_SQLITE_PATH: str = "ratelimit.db"
+    RATE_LIMIT_PURGE_INTERVAL_SECONDS: int = 3600  # Drops idle buckets from the SQLite file
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # Key ip limits on X-Forwarded-For, only behind a trusted proxy
+    RATE_LIMITS: Dict[str, str] = {  # "METHOD /route" -> "count/seconds ip|user", several separated by ";"
+        "POST /auth/signin": "10/60 ip",
+        "POST /auth/signup": "5/60 ip",
+        "GET /products/search": "60/60 ip; 120/60 user",
+    }
+    LOAD_SHED_ENABLED: bool = True
+    LOAD_SHED_TARGET_LAG_MS: int = 100  # Event-loop lag above which expensive requests start getting 503s
+
+    METRICS_ENABLED: bool = True  # Serves Prometheus text at /metrics, keep it off the public ingress
 
     class Config:
         env_file = ".env"
@@ -1,10 +1,120 @@
-from sqlalchemy import create_engine
+from typing import Hashable
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from .cache import TTLCache
 from .config import settings
 from .logger import logger  
 
-engine = create_engine(settings.DATABASE_URL)  # Creates a SQLAlchemy engine connected to PostgreSQL
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}  # Async driver used for each backend
+
+
+def async_database_url(url: str) -> str:  # postgresql+psycopg2://... -> postgresql+asyncpg://...
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}', set ASYNC_DATABASE_URL explicitly")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+# Pool and timeout settings shared by the sync and async engines. read_only: every PostgreSQL session
+# starts with default_transaction_read_only, so a write misrouted to a replica fails loudly.
+def engine_options(url: str, read_only: bool = False) -> dict:
+    url = make_url(url)
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    if url.get_backend_name() == "sqlite":  # SQLite uses its own pool classes without size limits
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    if url.get_backend_name() == "postgresql":
+        server_settings = {}  # Applied at connect time, before the driver opens any transaction
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if read_only:
+            server_settings["default_transaction_read_only"] = "on"
+        if server_settings and url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": server_settings}
+        elif server_settings:
+            options["connect_args"] = {"options": " ".join(f"-c {name}={value}" for name, value in server_settings.items())}
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))  # Creates a SQLAlchemy engine connected to PostgreSQL
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)  # Creates a factory to generate database sessions
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))  # Used by the API routes
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def make_read_only(engine):  # SQLite has no connect-time setting for it, query_only refuses writes per connection
+    @event.listens_for(engine.sync_engine, "connect")
+    def _read_only(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+replica_engine = None
+ReplicaSessionLocal = AsyncSessionLocal  # Without a replica, reads simply use the primary
+if settings.REPLICA_DATABASE_URL:
+    REPLICA_ASYNC_URL = async_database_url(settings.REPLICA_DATABASE_URL)
+    replica_engine = create_async_engine(REPLICA_ASYNC_URL, **engine_options(REPLICA_ASYNC_URL, read_only=True))
+    if replica_engine.dialect.name == "sqlite":
+        make_read_only(replica_engine)
+    ReplicaSessionLocal = async_sessionmaker(bind=replica_engine, autoflush=False, expire_on_commit=False)
+
+# Read-your-writes: keys ("user:<id>", ("product", id), CATALOG) that wrote recently, their reads go to the primary until
+# the replica has caught up. Per worker; a write served by another worker isn't seen here.
+CATALOG = "catalog"
+recent_writes = TTLCache(100_000, settings.READ_YOUR_WRITES_SECONDS)
+read_routing = {"replica": 0, "primary_pinned": 0}
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def product_key(product_id: int) -> tuple:  # Stock of one product changed, e.g. by a checkout
+    return ("product", product_id)
+
+
+def mark_recent_write(*keys: Hashable) -> None:
+    if replica_engine is not None:
+        for key in keys:
+            recent_writes.set(key, True)
+
+
+def recently_written(*keys: Hashable) -> bool:
+    return replica_engine is not None and any(recent_writes.get(key) is not None for key in keys)
+
+
+def read_session(*keys: Hashable):  # Session factory for a read-only request on behalf of `keys`
+    if replica_engine is None:
+        return AsyncSessionLocal
+    if recently_written(*keys):
+        read_routing["primary_pinned"] += 1
+        return AsyncSessionLocal
+    read_routing["replica"] += 1
+    return ReplicaSessionLocal
+
+def dialect_insert(dialect_name: str):  # insert() construct with ON CONFLICT support for the backends we run on
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise ValueError(f"Upserts are not supported on '{dialect_name}'")
+
+
 Base = declarative_base()  # Base class that all SQLAlchemy models will inherit from
 
 def get_db():
@@ -14,4 +124,18 @@ def get_db():
         yield db
     finally:
         db.close()
-        logger.debug("Database session closed.")
\ No newline at end of file
+        logger.debug("Database session closed.")
+
+async def get_async_db():
+    logger.debug("Creating new async database session.")
+    async with AsyncSessionLocal() as db:
+        yield db
+    logger.debug("Async database session closed.")
+
+async def get_read_db():  # Anonymous catalog reads: replica, unless an admin just changed the catalog
+    async with read_session(CATALOG)() as db:
+        yield db
+
+async def get_product_read_db(product_id: int):  # Product detail: also the primary right after a checkout took its stock
+    async with read_session(CATALOG, product_key(product_id))() as db:
+        yield db
@@ -1,22 +1,188 @@
+import random
 import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.core.models import EmailStatus, OutboxEmail
 
-def send_email(to_email: str, subject: str, body: str):
+
+# Queue an email inside the caller's transaction, it is only delivered once that commits
+def enqueue_email(db, to_email: str, subject: str, body: str) -> OutboxEmail:
+    message = OutboxEmail(to_email=to_email, subject=subject, body=body)
+    db.add(message)
+    return message
+
+
+def build_message(to_email: str, subject: str, body: str) -> str:
     msg = MIMEMultipart()
     msg["From"] = settings.EMAIL_USERNAME
     msg["To"] = to_email
     msg["Subject"] = subject
 
     msg.attach(MIMEText(body, "html"))
+    return msg.as_string()
+
+
+# One authenticated SMTP session reused across messages, reopened when idle too long or dropped by the server
+class SMTPConnection:
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def send(self, to_email: str, message: str):
+        try:
+            self._connection().sendmail(settings.EMAIL_USERNAME, to_email, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):  # Stale connection, retry once on a fresh one
+            self.close()
+            self._connection().sendmail(settings.EMAIL_USERNAME, to_email, message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server and time.monotonic() - self._last_used > settings.EMAIL_CONNECTION_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):  # Already gone, nothing to clean up
+            pass
+        self._server = None
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is None:
+            server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.EMAIL_TIMEOUT_SECONDS)
+            if settings.EMAIL_USE_TLS:
+                server.starttls()
+            server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
+            self._server = server
+            self._last_used = time.monotonic()
+            logger.debug("SMTP connection opened to %s:%s", settings.EMAIL_HOST, settings.EMAIL_PORT)
+        return self._server
+
+
+def retry_delay(attempts: int) -> float:  # Exponential backoff with jitter
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Background delivery of the email outbox. Safe with several threads and processes: messages are
+# claimed with an atomic UPDATE ... RETURNING (SKIP LOCKED on PostgreSQL) that pushes next_attempt_at
+# forward, so nobody else picks them up until the claim expires.
+class OutboxWorker:
+
+    def __init__(self, threads: int = 1):
+        self.threads = threads
+        self.sent = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"email-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Email outbox worker started with %s thread(s)", self.threads)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Email outbox worker stopped")
+
+    def notify(self):  # Called after a commit that queued mail, skips the poll wait
+        self._wake.set()
+
+    def _run(self):
+        connection = SMTPConnection()
+        while not self._stop.is_set():
+            try:
+                delivered = self.deliver_batch(connection)
+            except Exception:
+                logger.exception("Email outbox delivery failed")
+                delivered = 0
+            if not delivered:
+                self._wake.wait(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+                self._wake.clear()
+                connection.close_if_idle()
+        connection.close()
+
+    def deliver_batch(self, connection: SMTPConnection) -> int:
+        with SessionLocal() as db:
+            messages = self._claim(db)
+        if not messages:
+            return 0
+
+        results = []
+        for index, message in enumerate(messages):
+            try:
+                connection.send(message.to_email, build_message(message.to_email, message.subject, message.body))
+                results.append((message, None))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:  # Rejected message, keep going
+                results.append((message, repr(e)))
+            except (smtplib.SMTPException, OSError) as e:  # Server unreachable, retry the rest of the batch later
+                connection.close()
+                results.extend((pending, repr(e)) for pending in messages[index:])
+                break
+
+        with SessionLocal() as db:
+            self._record(db, results)
+        return len(messages)
+
+    def _claim(self, db: Session) -> list:
+        now = datetime.now(timezone.utc)
+        claimable = (
+            select(OutboxEmail.id)
+            .filter(OutboxEmail.status == EmailStatus.pending, OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.id)
+            .limit(settings.OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(claimable.scalar_subquery()))
+            .values(next_attempt_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS))
+            .returning(OutboxEmail.id, OutboxEmail.to_email, OutboxEmail.subject, OutboxEmail.body, OutboxEmail.attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return claimed
+
+    def _record(self, db: Session, results: list):
+        now = datetime.now(timezone.utc)
+        for message, error in results:
+            attempts = message.attempts + 1
+            if error is None:
+                values = {"status": EmailStatus.sent, "sent_at": now, "attempts": attempts, "last_error": None}
+                self.sent += 1
+                logger.info("[EMAIL SENT] to %s", message.to_email)
+            elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                values = {"status": EmailStatus.failed, "attempts": attempts, "last_error": error}
+                self.failed += 1
+                logger.error("[EMAIL FAILED] to %s after %s attempts: %s", message.to_email, attempts, error)
+            else:
+                retry_at = now + timedelta(seconds=retry_delay(attempts))
+                values = {"attempts": attempts, "last_error": error, "next_attempt_at": retry_at}
+                logger.warning("[EMAIL RETRY] to %s at %s: %s", message.to_email, retry_at.isoformat(), error)
+            db.execute(update(OutboxEmail).where(OutboxEmail.id == message.id).values(**values))
+        db.commit()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "threads": len(self._threads)}
+
 
-    try:
-        server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
-        server.starttls()
-        server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
-        server.sendmail(settings.EMAIL_USERNAME, to_email, msg.as_string())
-        server.quit()
-        print(f"[EMAIL SENT] to {to_email}")
-    except Exception as e:
-        print(f"[EMAIL ERROR] {str(e)}")
+outbox_worker = OutboxWorker(settings.OUTBOX_WORKER_THREADS)
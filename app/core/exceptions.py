@@ -5,18 +5,19 @@ from app.core.logger import logger
 
 
 async def custom_http_exception_handler(request: Request, exc: StarletteHTTPException):
-    logger.error(f"HTTP error: {exc.detail} - Path: {request.url.path}")
+    logger.error("HTTP error: %s - Path: %s", exc.detail, request.url.path)
     return JSONResponse(
         status_code=exc.status_code,
         content={
             "error": True,
             "message": exc.detail,
             "code": exc.status_code
-        }
+        },
+        headers=getattr(exc, "headers", None)  # e.g. Retry-After on 503s
     )
 
 async def unhandled_exception_handler(request: Request, exc: Exception):
-    logger.exception(f"Unhandled exception at {request.url.path}: {repr(exc)}")
+    logger.exception("Unhandled exception at %s: %s", request.url.path, repr(exc))
     return JSONResponse(
         status_code=500,
         content={
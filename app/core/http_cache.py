@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from app.core.cache import TTLCache
+from app.core.serialization import RowSerializer
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict
+    tags: frozenset
+
+
+# In-memory cache of serialized GET responses with ETag / If-None-Match support.
+# Entries carry tags (e.g. "product:42") so writes can invalidate exactly what they touched.
+class ResponseCache:
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self._entries = TTLCache(maxsize, ttl)
+        self._keys_by_tag = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path: str, params=()) -> str:  # Path plus sorted query params, so ?a=1&b=2 and ?b=2&a=1 share an entry
+        return f"{path}?{urlencode(sorted(params))}"
+
+    @classmethod
+    def key_for(cls, request: Request) -> str:
+        return cls.key(request.url.path, request.query_params.multi_items())
+
+    def lookup(self, request: Request) -> Optional[Response]:
+        cached = self._entries.get(self.key_for(request))
+        if cached is None:
+            return None
+        return self._respond(request, cached)
+
+    def store(self, request: Request, serializer: RowSerializer, content, tags: Iterable[str], headers=None) -> Response:
+        return self._respond(request, self.put(self.key_for(request), serializer, content, tags, headers))
+
+    def put(self, key: str, serializer: RowSerializer, content, tags: Iterable[str], headers=None) -> CachedResponse:  # Also used to pre-warm entries
+        body = serializer.dumps(content)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        cached = CachedResponse(body, etag, dict(headers or {}), frozenset(tags))
+
+        with self._lock:
+            self._entries.set(key, cached)
+            for tag in cached.tags:
+                self._keys_by_tag[tag].add(key)
+            if len(self._keys_by_tag) > 4 * self._entries.maxsize:  # Forget tags whose entries were evicted
+                self._rebuild_tag_index()
+        return cached
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._entries.pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    def _rebuild_tag_index(self) -> None:
+        live = defaultdict(set)
+        for key, cached in self._entries.items():
+            for tag in cached.tags:
+                live[tag].add(key)
+        self._keys_by_tag = live
+
+    def _respond(self, request: Request, cached: CachedResponse) -> Response:
+        headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": f"public, max-age={self.ttl}"}
+        if_none_match = request.headers.get("if-none-match")
+        # Weak comparison: compressed responses carry the same tag as W/"..."
+        if if_none_match and (if_none_match.strip() == "*" or cached.etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}):
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logger import logger
+from app.core.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+def fingerprint(request: Request, payload: Optional[BaseModel]) -> str:
+    body = payload.model_dump_json() if payload is not None else ""
+    return hashlib.sha256(f"{request.method} {request.url.path}\n{body}".encode()).hexdigest()
+
+
+def _key_filter(user_id: int, key: str):
+    return (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+
+async def purge_expired_keys() -> int:  # Maintenance job, expired keys are also replaced on their next use
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.now(timezone.utc)))
+        await db.commit()
+    return result.rowcount
+
+
+# Returns the stored row to replay, or None once this request (`owner`) holds the key. A duplicate arriving
+# while the first request is still running polls until it finishes (or its claim lapses) instead of racing it.
+async def _claim(user_id: int, key: str, request_fingerprint: str, owner: str):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.02
+    while True:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            record = (await db.execute(
+                select(
+                    IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response_body,
+                    (IdempotencyKey.expires_at <= now).label("expired"),  # Compared in SQL, SQLite hands back naive datetimes
+                    (IdempotencyKey.locked_until <= now).label("stale"),
+                ).filter(*_key_filter(user_id, key))
+            )).first()
+
+            if record is None or record.expired:
+                await db.execute(delete(IdempotencyKey).filter(*_key_filter(user_id, key), IdempotencyKey.expires_at <= now))
+                try:
+                    await db.execute(insert(IdempotencyKey).values(
+                        user_id=user_id, key=key, fingerprint=request_fingerprint, owner=owner,
+                        locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                    ))
+                    await db.commit()
+                    return None
+                except IntegrityError:  # Another request claimed it first, look again
+                    await db.rollback()
+                    continue
+
+            if record.fingerprint != request_fingerprint:
+                raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used for a different request")
+            if record.status_code is not None:
+                return record
+
+            if record.stale:  # The first request died without finishing, take the key over
+                result = await db.execute(
+                    update(IdempotencyKey)
+                    .filter(*_key_filter(user_id, key), IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until <= now)
+                    .values(owner=owner, locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS))
+                )
+                await db.commit()
+                if result.rowcount:
+                    return None
+                continue
+
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail=f"A request with this {IDEMPOTENCY_HEADER} is still being processed")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+async def _not_recorded(result):  # Without a key there's nothing to store
+    pass
+
+
+# Runs handler at most once per (user, key): the first successful response is stored and returned
+# as-is to every retry, without running the handler again. The handler gets a `record(result)`
+# callback and awaits it right before its commit, so the response is saved in the same transaction
+# as the work itself. A failure before that commit releases the key so the client can retry; once
+# it committed the key stays, even if something after the commit raises. Without a key the handler
+# simply runs.
+async def run_idempotent(
+    request: Request,
+    db: AsyncSession,
+    user_id: int,
+    key: Optional[str],
+    adapter: TypeAdapter,
+    handler: Callable[[Callable[[object], Awaitable]], Awaitable],
+    payload: Optional[BaseModel] = None,
+):
+    if key is None:
+        return await handler(_not_recorded)
+
+    owner = uuid.uuid4().hex
+    stored = await _claim(user_id, key, fingerprint(request, payload), owner)
+    if stored is not None:
+        logger.info("Replaying stored response for %s %s (user %s)", request.method, request.url.path, user_id)
+        return Response(stored.response_body, status_code=stored.status_code, media_type="application/json", headers={REPLAYED_HEADER: "true"})
+
+    body = None
+
+    async def record(result):
+        nonlocal body
+        body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+        updated = await db.execute(
+            update(IdempotencyKey)
+            .filter(*_key_filter(user_id, key), IdempotencyKey.status_code.is_(None), IdempotencyKey.owner == owner)
+            .values(status_code=200, response_body=body, locked_until=datetime.now(timezone.utc))
+        )
+        if updated.rowcount == 0:  # Our claim lapsed and a retry took it over; roll back rather than do the work twice
+            raise HTTPException(status_code=409, detail=f"A request with this {IDEMPOTENCY_HEADER} is still being processed")
+
+    try:
+        await handler(record)
+    except BaseException:
+        await db.rollback()  # Drops the recorded response unless it was committed, and the handler's locks with it
+        async with AsyncSessionLocal() as release_db:  # Only our own claim, and only if it never got a committed response
+            await release_db.execute(delete(IdempotencyKey).filter(
+                *_key_filter(user_id, key), IdempotencyKey.status_code.is_(None), IdempotencyKey.owner == owner
+            ))
+            await release_db.commit()
+        raise
+    if body is None:
+        raise RuntimeError("Idempotent handler returned without recording its response")
+    return Response(body, media_type="application/json")
@@ -1,16 +1,89 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from app.core.config import settings
 
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")  # Set per request by RequestIDMiddleware
+
+
+class RequestIdFilter(logging.Filter):  # Runs on the calling thread, where the request context is visible
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):  # Keeps only a fraction of DEBUG records on hot paths
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
 
-logger = logging.getLogger("ecommerce_backend")
-logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler(f"{LOG_DIR}/app.log", mode="w")
-file_handler.setLevel(logging.DEBUG)
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # Hands records to the listener thread as-is: message formatting happens there, not on the request path.
+    # When the queue is full the record is dropped and counted instead of blocking the request.
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def _file_handler() -> logging.Handler:
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    path = os.path.join(settings.LOG_DIR, settings.LOG_FILE)
+    if settings.LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"))
+    return handler
+
+
+logger = logging.getLogger("ecommerce_backend")
+logger.setLevel(settings.LOG_LEVEL.upper())
+logger.propagate = False
 
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
+log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+queue_handler.addFilter(DebugSampler(settings.LOG_DEBUG_SAMPLE_RATE))
+queue_handler.addFilter(RequestIdFilter())
+logger.addHandler(queue_handler)
 
-logger.addHandler(file_handler)
+listener = logging.handlers.QueueListener(log_queue, _file_handler(), respect_handler_level=True)  # Background writer thread
+listener.start()
+atexit.register(listener.stop)  # Flushes whatever is still queued on interpreter exit
@@ -0,0 +1,229 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+request_db_var: ContextVar[Optional[list]] = ContextVar("request_db", default=None)  # [queries, seconds] of the current request
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Minimal Prometheus-style metrics, kept in process memory (one set per worker)
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):  # Yields (name, labels, value)
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)  # Bucket bounds are inclusive (le)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    # Exposes the stats() dict of an existing component as gauges named <prefix>_<key>.
+    # With label set, stats_fn returns {label value: stats dict} instead.
+    def register_stats(self, prefix: str, documentation: str, stats_fn: Callable[[], dict], label: str = None):
+        self._collectors.append((prefix, documentation, stats_fn, label))
+
+    def _collect(self):
+        for prefix, documentation, stats_fn, label in self._collectors:
+            groups = stats_fn() if label else {None: stats_fn()}
+            families = {}
+            for group, stats in groups.items():
+                for key, value in stats.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        families.setdefault(f"{prefix}_{key}", []).append(({label: group} if label else {}, value))
+            for name, samples in families.items():
+                yield name, "gauge", documentation, samples
+
+    def render(self) -> str:  # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, kind, documentation, samples in self._collect():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter("http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+http_requests_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests currently being served"))
+request_db_queries = registry.register(Histogram("http_request_db_queries", "Database queries issued per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS))
+request_db_duration = registry.register(Histogram("http_request_db_seconds", "Database time spent per HTTP request", ("method", "route")))
+db_queries_total = registry.register(Counter("db_queries_total", "Statements executed, including background workers", ("engine",)))
+db_query_seconds_total = registry.register(Counter("db_query_seconds_total", "Time spent executing statements", ("engine",)))
+db_pool_checkouts_total = registry.register(Counter("db_pool_checkouts_total", "Connections checked out of the pool", ("engine",)))
+db_pool_connects_total = registry.register(Counter("db_pool_connects_total", "New DBAPI connections opened by the pool", ("engine",)))
+
+
+# Times every statement on the engine and charges it to the request that issued it, if any
+def instrument_engine(engine, name: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info.pop("query_started_at", None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        db_queries_total.inc(engine=name)
+        db_query_seconds_total.inc(elapsed, engine=name)
+        stats = request_db_var.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts_total.inc(engine=name)
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        db_pool_connects_total.inc(engine=name)
+
+
+def pool_stats(engines: dict) -> dict:  # {engine name: checked out / overflow / size} for pools that report it
+    stats = {}
+    for name, engine in engines.items():
+        pool = engine.pool
+        stats[name] = {
+            key: getattr(pool, key)() for key in ("size", "checkedout", "checkedin", "overflow") if hasattr(pool, key)
+        }
+    return stats
+
+
+# Pure ASGI middleware: the route template is only known after routing, so it is read back from the scope
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500  # Stays 500 if the app raises before responding
+        db_stats = [0, 0.0]
+        token = request_db_var.set(db_stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            http_requests_in_flight.dec()
+            request_db_var.reset(token)
+            route = getattr(scope.get("route"), "path", "<unmatched>")  # Template, not the raw path, to bound cardinality
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route, status=str(status))
+            http_request_duration.observe(elapsed, method=method, route=route)
+            request_db_queries.observe(db_stats[0], method=method, route=route)
+            request_db_duration.observe(db_stats[1], method=method, route=route)
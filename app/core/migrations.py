@@ -0,0 +1,32 @@
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from app.core.database import engine
+from app.core.logger import logger
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def alembic_config(connection=None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False  # Keep the app's logging setup
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+# Brings the schema to the latest revision. On PostgreSQL an advisory lock makes concurrent workers
+# wait for the first one instead of racing it through the same DDL.
+def upgrade_database():
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('alembic_upgrade'))"))
+        tables = set(inspect(connection).get_table_names())
+        if tables and "alembic_version" not in tables:
+            raise RuntimeError(
+                "Database was created without migrations. Run `alembic stamp 0001` once, then upgrade "
+                "(`alembic upgrade head`, or start the app)."
+            )
+        command.upgrade(alembic_config(connection), "head")
+    logger.info("Database schema is up to date.")
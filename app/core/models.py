@@ -0,0 +1,56 @@
+from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, Index, LargeBinary
+from app.core.database import Base
+from datetime import datetime, timezone
+import enum
+
+
+class EmailStatus(str, enum.Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
+# Transactional outbox: rows are written in the same transaction as the data they announce,
+# then delivered by app.core.email.OutboxWorker.
+class OutboxEmail(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),)  # Worker's claim query
+
+
+# First response to a request sent with an Idempotency-Key, replayed to retries (see app.core.idempotency).
+# status_code is null while the first request is still running.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # Hash of method, path and body; a reused key must match
+    status_code = Column(Integer)
+    response_body = Column(LargeBinary)
+    locked_until = Column(DateTime(timezone=True), nullable=False)  # In-flight claim expires, a crashed request can't block retries
+    owner = Column(String(32))  # Token of the request holding the claim, changes when a retry takes a stale claim over
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)  # Purge of expired keys
+
+
+# One row per exclusive maintenance job (app.core.scheduler). The worker that holds the unexpired lease
+# runs the job, the others skip it, so it runs about once per interval however many workers there are.
+class MaintenanceLease(Base):
+    __tablename__ = "maintenance_leases"
+
+    name = Column(String(64), primary_key=True)
+    owner = Column(String(128), nullable=False)  # host:pid:nonce of the worker that last took it
+    expires_at = Column(DateTime(timezone=True), nullable=False)
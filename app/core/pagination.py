@@ -0,0 +1,73 @@
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Callable, List
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"  # Response header carrying the cursor of the following page
+
+
+# Cursors are opaque to clients: base64 of the query scope plus the sort key of the last row returned
+def encode_cursor(scope: str, values: list) -> str:
+    raw = json.dumps([scope, *values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# Cursor values come back from the client, so each one is checked against the type of its sort column.
+# JSON has no int / float distinction worth trusting: a float column may come back as 12, and bool is an int.
+def cursor_int(value) -> int:
+    if type(value) is not int:
+        raise ValueError(value)
+    return value
+
+
+def cursor_float(value) -> float:
+    if type(value) not in (int, float) or not math.isfinite(value):  # json.loads accepts NaN and Infinity
+        raise ValueError(value)
+    return float(value)
+
+
+def cursor_str(value) -> str:
+    if type(value) is not str:
+        raise ValueError(value)
+    return value
+
+
+def cursor_datetime(value) -> datetime:
+    return datetime.fromisoformat(cursor_str(value))
+
+
+# parsers: one per sort key, e.g. [cursor_float, cursor_int] for (price, id). Any mismatch is a 400.
+def decode_cursor(scope: str, cursor: str, parsers: List[Callable]) -> list:
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(decoded, list) or len(decoded) != len(parsers) + 1 or decoded[0] != scope:  # Cursor was issued for a different query
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return [parse(value) for parse, value in zip(parsers, decoded[1:])]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Rows are fetched with limit + 1; the extra row only signals that another page exists
+def trim_page(response: Response, rows: list, limit: int, scope: str, key) -> list:
+    if len(rows) > limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(scope, key(rows[limit - 1]))
+    return rows[:limit]
+
+
+# Seek predicate for keyset pagination: rows strictly after `values` in (columns...) order.
+# Written as "col >= v AND (col > v OR <rest>)" so the leading bound stays usable as an index range.
+def keyset_condition(columns: list, values: list, descending: bool = False):
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column < value if descending else column > value
+
+    rest = keyset_condition(columns[1:], values[1:], descending)
+    if descending:
+        return and_(column <= value, or_(column < value, rest))
+    return and_(column >= value, or_(column > value, rest))
@@ -0,0 +1,239 @@
+import asyncio
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+from app.core.logger import logger
+
+RULE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d+(?:\.\d+)?)\s*(ip|user)\s*$")
+EXEMPT_PATHS = {"/", "/metrics"}  # Never shed: health checks and scrapes must see the overload
+
+
+class Rule(NamedTuple):
+    method: str
+    route: str
+    path_regex: re.Pattern
+    capacity: int  # Burst size, and requests allowed per window
+    rate: float  # Tokens refilled per second
+    scope: str  # "ip" or "user" (anonymous callers fall back to their ip)
+
+
+# {"POST /auth/signin": "10/60 ip; 100/3600 ip"} -> token buckets of 10 per minute and 100 per hour per client ip
+def parse_rules(config: Dict[str, str]) -> List[Rule]:
+    rules = []
+    for endpoint, limits in config.items():
+        method, route = endpoint.split(" ", 1)
+        path_regex = compile_path(route.strip())[0]
+        for limit in filter(None, (part.strip() for part in limits.split(";"))):
+            match = RULE_PATTERN.match(limit)
+            if not match:
+                raise ValueError(f"Invalid rate limit '{limit}' for {endpoint}, expected e.g. '10/60 ip'")
+            count, seconds, scope = int(match[1]), float(match[2]), match[3]
+            rules.append(Rule(method.upper(), route.strip(), path_regex, count, count / seconds, scope))
+    return rules
+
+
+# Buckets in this process only: each worker enforces the limit on its own share of the traffic
+class MemoryBucketStore:
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:  # 0 when allowed, else seconds until a token frees up
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            if len(self._buckets) > self.max_keys:  # Idle clients have full buckets, forgetting them changes nothing
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < capacity / rate}
+        return wait
+
+
+# Buckets in a local SQLite file shared by every worker process on the host. Each check is one atomic
+# UPSERT that only consumes a token when one is available; the state is disposable, so durability is off.
+# Checks run on the event loop, so they never wait for the file lock: busy timeout 0, and a check that
+# finds the file locked fails open. Old buckets are dropped by a maintenance job (purge_buckets).
+class SQLiteBucketStore:
+    TAKE = """
+        INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+        ON CONFLICT (key) DO UPDATE SET tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1, updated = :now
+        WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.errors = 0
+        self.busy = 0  # Checks let through because another process held the write lock
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():  # Never share a connection across a fork
+            self._connection, self._pid = _open_buckets(self.path, timeout=0), os.getpid()
+        return self._connection
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.time()
+        params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        try:
+            with self._lock:
+                connection = self._connect()
+                if connection.execute(self.TAKE, params).rowcount:
+                    return 0.0
+                tokens, updated = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+        except sqlite3.Error as error:  # Fail open, a limiter outage must not become an API outage
+            if getattr(error, "sqlite_errorcode", None) == sqlite3.SQLITE_BUSY:
+                self.busy += 1
+            else:
+                self.errors += 1
+                logger.warning("Rate limit store unavailable", exc_info=True)
+            return 0.0
+
+
+def _open_buckets(path: str, timeout: float) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+    return connection
+
+
+# Drops buckets idle for `max_age` seconds, they'd be full again anyway. Blocking, run it in a thread.
+def purge_buckets(path: str, max_age: float = 24 * 3600) -> int:
+    connection = _open_buckets(path, timeout=5)
+    try:
+        return connection.execute("DELETE FROM buckets WHERE updated < ?", (time.time() - max_age,)).rowcount
+    finally:
+        connection.close()
+
+
+class RateLimiter:
+
+    def __init__(self, rules: List[Rule], store, identify_user: Callable[[Optional[str]], Optional[str]], trust_forwarded_for: bool = False):
+        self.rules = rules
+        self.store = store
+        self.identify_user = identify_user  # Authorization header -> verified user, or None
+        self.trust_forwarded_for = trust_forwarded_for
+        self.limited = 0
+
+    def match(self, method: str, path: str) -> List[Rule]:
+        return [rule for rule in self.rules if rule.method == method and rule.path_regex.match(path)]
+
+    def _client_ip(self, scope, headers: dict) -> str:
+        if self.trust_forwarded_for and b"x-forwarded-for" in headers:
+            return headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check(self, scope, rules: List[Rule]) -> float:  # Longest wait among the exhausted buckets, 0 if allowed
+        headers = dict(scope["headers"])
+        user = None
+        if any(rule.scope == "user" for rule in rules):
+            authorization = headers.get(b"authorization")
+            user = self.identify_user(authorization.decode("latin-1") if authorization else None)
+
+        wait = 0.0
+        for index, rule in enumerate(rules):
+            identity = f"user:{user}" if rule.scope == "user" and user else f"ip:{self._client_ip(scope, headers)}"
+            wait = max(wait, self.store.take(f"{rule.method} {rule.route}#{index}|{identity}", rule.capacity, rule.rate))
+        if wait:
+            self.limited += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {"limited": self.limited, "store_errors": getattr(self.store, "errors", 0), "store_busy": getattr(self.store, "busy", 0)}
+
+
+# Adaptive load shedding driven by event-loop lag, which grows with the work queued behind the running
+# request. Past the target a growing share of requests is refused up front; rate-limited (expensive)
+# routes go first, everything else only at twice the target.
+class LoadShedder:
+
+    def __init__(self, target_seconds: float, interval: float = 0.05):
+        self.target = target_seconds
+        self.interval = interval
+        self.lag = 0.0
+        self.shed = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._monitor())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _monitor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.lag = lag if lag > self.lag else self.lag * 0.8 + lag * 0.2  # React at once, recover smoothly
+
+    def should_shed(self, expensive: bool) -> bool:
+        target = self.target if expensive else self.target * 2
+        if self.lag <= target:
+            return False
+        if random.random() >= min(1.0, (self.lag - target) / target):
+            return False
+        self.shed += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"event_loop_lag_seconds": self.lag, "shed": self.shed}
+
+
+def _reject(status_code: int, message: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": True, "message": message, "code": status_code},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+# Pure ASGI middleware: refuses work before routing, parsing or any DB access happens
+class RateLimitMiddleware:
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, shedder: Optional[LoadShedder] = None):
+        self.app = app
+        self.limiter = limiter
+        self.shedder = shedder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        rules = self.limiter.match(scope["method"], scope["path"]) if self.limiter else []
+        if self.shedder and self.shedder.should_shed(expensive=bool(rules)):
+            logger.warning("Load shed %s %s, event loop lag %.3fs", scope["method"], scope["path"], self.shedder.lag)
+            return await _reject(503, "Server busy, please retry", self.shedder.lag)(scope, receive, send)
+
+        if rules:
+            wait = self.limiter.check(scope, rules)
+            if wait:
+                logger.info("Rate limited %s %s", scope["method"], scope["path"])
+                return await _reject(429, "Too many requests", wait)(scope, receive, send)
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import delete, inspect, select
+from app.core.database import AsyncSessionLocal, async_engine, dialect_insert
+from app.core.logger import logger
+from app.core.models import MaintenanceLease
+
+
+# Takes the job's lease for `seconds` unless another worker holds an unexpired one. The upsert is the
+# atomic step: of several workers racing for an expired lease only one row update matches.
+async def acquire_lease(name: str, owner: str, seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        insert = dialect_insert(db.bind.dialect.name)
+        statement = insert(MaintenanceLease).values(name=name, owner=owner, expires_at=now + timedelta(seconds=seconds))
+        result = await db.execute(statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"owner": statement.excluded.owner, "expires_at": statement.excluded.expires_at},
+            where=MaintenanceLease.expires_at <= now,
+        ))
+        await db.commit()
+    return result.rowcount == 1
+
+
+# Deletes matching rows a batch at a time, each in its own short transaction, so row locks are held
+# briefly and requests get the database in between. `model` needs a single-column primary key.
+async def delete_in_batches(model, condition, batch_size: int, pause: float = 0.05) -> int:
+    key = inspect(model).primary_key[0]
+    deleted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(model)
+                .filter(key.in_(select(key).filter(condition).limit(batch_size)))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        await asyncio.sleep(pause)
+
+
+async def refresh_table_stats(*tables: str) -> int:  # Planner statistics, so index choices follow the data as it grows
+    async with async_engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            await connection.exec_driver_sql(f"ANALYZE {', '.join(tables)}")
+        else:
+            for table in tables:
+                await connection.exec_driver_sql(f"ANALYZE {table}")
+        await connection.commit()
+    return len(tables)
+
+
+class Job:
+
+    def __init__(self, name: str, fn: Callable[[], Awaitable], interval: float, exclusive: bool, initial_delay: Optional[float]):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.exclusive = exclusive  # One worker per interval (lease) rather than every worker
+        self.initial_delay = initial_delay
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0  # Lease held by another worker
+        self.rows = 0  # Result of the last run, e.g. rows deleted
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.last_success = 0.0  # Unix time
+
+
+# In-process periodic jobs, one asyncio task each. Every run is offset by a random +-jitter share of
+# its interval, so workers started together don't hit the database in step. Exclusive jobs take a
+# lease in maintenance_leases first, which makes them run about once per interval across all workers.
+class Scheduler:
+
+    def __init__(self, jitter: float):
+        self.jitter = jitter
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self._tasks = []
+
+    def add(self, name: str, fn: Callable[[], Awaitable], interval: float, exclusive: bool = True, initial_delay: Optional[float] = None):
+        self.jobs[name] = Job(name, fn, interval, exclusive, initial_delay)
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def run(self, job: Job) -> bool:  # False when another worker holds the lease
+        # The lease ends just before this worker's earliest next attempt, so whichever worker comes next runs it
+        if job.exclusive and not await acquire_lease(job.name, self.owner, max(1, job.interval * (1 - self.jitter) - 1)):
+            job.skipped += 1
+            return False
+        started = time.perf_counter()
+        try:
+            result = await job.fn()
+        except Exception:
+            job.failures += 1
+            logger.warning("Maintenance job %s failed", job.name, exc_info=True)
+            return True
+        finally:
+            job.last_duration = time.perf_counter() - started
+            job.total_duration += job.last_duration
+            job.runs += 1
+        job.rows = result if isinstance(result, int) else 0
+        job.last_success = time.time()
+        logger.info("Maintenance job %s done in %.3fs (%s)", job.name, job.last_duration, job.rows)
+        return True
+
+    async def _loop(self, job: Job):
+        initial_delay = job.initial_delay if job.initial_delay is not None else random.uniform(0, self.jitter * job.interval)
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                await self.run(job)
+            except Exception:  # Lease query failed, the database may be down; try again next time
+                job.failures += 1
+                logger.warning("Maintenance job %s could not start", job.name, exc_info=True)
+            await asyncio.sleep(self._jittered(job.interval))
+
+    def start(self):
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "runs": job.runs,
+                "failures": job.failures,
+                "skipped": job.skipped,
+                "rows": job.rows,
+                "last_duration_seconds": job.last_duration,
+                "duration_seconds_total": job.total_duration,
+                "last_success_timestamp": job.last_success,
+            }
+            for name, job in self.jobs.items()
+        }
@@ -0,0 +1,69 @@
+import operator
+import typing
+from typing import Type
+import orjson
+from fastapi import Response
+from pydantic import AliasChoices, BaseModel
+
+
+def _source_attribute(name: str, field) -> str:  # Where the value lives on the row: first validation alias, else the field name
+    alias = field.validation_alias
+    if isinstance(alias, AliasChoices):
+        return alias.choices[0]
+    return alias if isinstance(alias, str) else name
+
+
+def _is_flat(annotation) -> bool:  # Nested models and lists would need their own serializer
+    for arg in (annotation, *typing.get_args(annotation)):
+        if typing.get_origin(arg) in (list, dict, set, tuple) or (isinstance(arg, type) and issubclass(arg, BaseModel)):
+            return False
+    return True
+
+
+# Row -> JSON bytes for a flat response model, without building pydantic objects. The field list is
+# compiled once into an attrgetter (ORM objects) or an itemgetter over column positions (result rows,
+# which are tuples), so each row costs one C call plus a dict; orjson encodes the page. Values are
+# emitted as loaded: columns are already typed, enums serialize as their value and datetimes as
+# ISO 8601, the same output as the response_model.
+class RowSerializer:
+
+    def __init__(self, model: Type[BaseModel], many: bool = False):
+        bad = [name for name, field in model.model_fields.items() if not _is_flat(field.annotation)]
+        if bad:
+            raise TypeError(f"{model.__name__} has nested fields {bad}, serialize it through the response_model")
+        self.many = many
+        self.fields = tuple(model.model_fields)
+        self._attributes = [_source_attribute(name, field) for name, field in model.model_fields.items()]
+        self._by_attribute = self._tuple_getter(operator.attrgetter(*self._attributes))
+        self._by_position = {}  # Result column names -> itemgetter
+
+    def _tuple_getter(self, getter):  # attrgetter / itemgetter return a bare value for a single field
+        return getter if len(self._attributes) > 1 else lambda row: (getter(row),)
+
+    def _values(self, row):
+        columns = getattr(row, "_fields", None)
+        if columns is None:
+            return self._by_attribute
+        getter = self._by_position.get(columns)
+        if getter is None:
+            try:
+                getter = self._tuple_getter(operator.itemgetter(*(columns.index(name) for name in self._attributes)))
+            except ValueError:  # Column missing from the select, let the attribute lookup raise a clear error
+                getter = self._by_attribute
+            self._by_position[columns] = getter
+        return getter
+
+    def row(self, row) -> dict:
+        return dict(zip(self.fields, self._values(row)(row)))
+
+    def dumps(self, content) -> bytes:
+        if self.many:
+            if not content:
+                return b"[]"
+            fields, values = self.fields, self._values(content[0])  # A page's rows all share one shape
+            return orjson.dumps([dict(zip(fields, values(row))) for row in content])
+        return orjson.dumps(self.row(content))
+
+
+def json_response(serializer: RowSerializer, content, headers=None) -> Response:  # headers: e.g. the injected response's X-Next-Cursor
+    return Response(content=serializer.dumps(content), media_type="application/json", headers=dict(headers or {}))
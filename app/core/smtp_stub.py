@@ -0,0 +1,95 @@
+# Minimal local SMTP server for developing and testing email delivery offline.
+#
+#   python -m app.core.smtp_stub --port 2525 --maildir ./mail
+#
+# Point EMAIL_HOST/EMAIL_PORT at it and set EMAIL_USE_TLS=false. Any AUTH PLAIN/LOGIN credentials are
+# accepted, and every message received is printed and optionally written to --maildir as a .eml file.
+import argparse
+import asyncio
+import os
+import uuid
+
+
+class SMTPStub:
+
+    def __init__(self, maildir: str = None):
+        self.maildir = maildir
+        self.received = []
+        if maildir:
+            os.makedirs(maildir, exist_ok=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        sender, recipients = None, []
+        await reply("220 smtp-stub ready")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                await reply("250-smtp-stub")
+                await reply("250-AUTH PLAIN LOGIN")
+                await reply("250 8BITMIME")
+            elif verb == "HELO":
+                await reply("250 smtp-stub")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    if len(command.split()) < 3:  # Username not sent inline
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                    await reply("334 UGFzc3dvcmQ6")
+                    await reader.readline()
+                await reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip(), []
+                await reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip())
+                await reply("250 OK")
+            elif verb == "DATA":
+                await reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = await reader.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)  # Undo dot-stuffing
+                self.store(sender, recipients, b"".join(data))
+                await reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                await reply("250 OK")
+            elif verb == "QUIT":
+                await reply("221 Bye")
+                break
+            else:
+                await reply("502 Command not implemented")
+
+        writer.close()
+
+    def store(self, sender: str, recipients: list, message: bytes):
+        self.received.append((sender, recipients, message))
+        print(f"[SMTP STUB] {sender} -> {', '.join(recipients)} ({len(message)} bytes)")
+        if self.maildir:
+            with open(os.path.join(self.maildir, f"{uuid.uuid4()}.eml"), "wb") as f:
+                f.write(message)
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[SMTP STUB] listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--maildir", default=None)
+    args = parser.parse_args()
+    asyncio.run(SMTPStub(args.maildir).serve(args.host, args.port))
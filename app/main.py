@@ -1,23 +1,67 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.openapi.utils import get_openapi
-from .core.database import Base, engine
+from starlette.concurrency import run_in_threadpool
+from .core.database import async_engine, engine, read_routing, replica_engine
 from .core.exceptions import custom_http_exception_handler, unhandled_exception_handler
-from app.core.logger import logger
+from app.core.compression import CompressionMiddleware, compression_stats
+from app.core.config import settings
+from app.core.email import outbox_worker
+from app.core.logger import NonBlockingQueueHandler, logger
+from app.core.metrics import MetricsMiddleware, instrument_engine, pool_stats, registry
+from app.core.middleware import RequestIDMiddleware
+from app.core.migrations import upgrade_database
+from app.core.ratelimit import LoadShedder, MemoryBucketStore, RateLimiter, RateLimitMiddleware, SQLiteBucketStore, parse_rules
 from app.auth.models import User
+from app.auth.revocation import revocation_list
+from app.auth.utils import auth_cache_stats, password_hasher, user_from_authorization
+from app.cart.cache import cart_summary_cache
+from app.maintenance import scheduler
+from app.products.cache import product_response_cache
+from app.products.facets import catalog_facets
 from app.auth.routes import router as auth_router
 from app.products.routes import admin_router as admin_product_router
 from app.products.routes import public_router as public_product_router
 from app.cart.routes import router as cart_router
 from app.orders.routes import order_router as order_router
 from app.orders.routes import checkout_router as checkout_router
+from app.reports.routes import router as report_router
  
 
+rate_limiter = None
+if settings.RATE_LIMIT_ENABLED:
+    bucket_store = SQLiteBucketStore(settings.RATE_LIMIT_SQLITE_PATH) if settings.RATE_LIMIT_BACKEND == "sqlite" else MemoryBucketStore()
+    rate_limiter = RateLimiter(parse_rules(settings.RATE_LIMITS), bucket_store, user_from_authorization, settings.RATE_LIMIT_TRUST_FORWARDED_FOR)
+load_shedder = LoadShedder(settings.LOAD_SHED_TARGET_LAG_MS / 1000) if settings.LOAD_SHED_ENABLED else None
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("E-commerce backend starting up.")  # Startup code
+    if settings.DB_AUTO_MIGRATE:
+        await run_in_threadpool(upgrade_database)
+    await revocation_list.sync()  # Full load before serving, then incremental syncs in the background
+    revocation_list.start()
+    await catalog_facets.reload()
+    catalog_facets.start()
+    password_hasher.start()
+    if settings.OUTBOX_ENABLED:
+        outbox_worker.start()
+    if load_shedder:
+        load_shedder.start()
+    if settings.MAINTENANCE_ENABLED:
+        scheduler.start()
     yield
+    await scheduler.stop()
+    if load_shedder:
+        await load_shedder.stop()
+    if settings.OUTBOX_ENABLED:
+        outbox_worker.stop()
+    password_hasher.shutdown()
+    await catalog_facets.stop()
+    await revocation_list.stop()
     logger.info("E-commerce backend shutting down.")  # Shutdown code
 
 
@@ -26,17 +70,29 @@ app = FastAPI(  # Instance of fastapi
     lifespan=lifespan
 ) 
 
+if settings.COMPRESSION_ENABLED:  # Innermost: everything above it sees the plain response
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_BYTES,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+if rate_limiter or load_shedder:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, shedder=load_shedder)
+app.add_middleware(RequestIDMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)  # Added last so it is outermost and also times the request id layer
+
 app.add_exception_handler(StarletteHTTPException, custom_http_exception_handler)
 app.add_exception_handler(Exception, unhandled_exception_handler)
 
-Base.metadata.create_all(bind=engine)
-
 app.include_router(auth_router)
 app.include_router(admin_product_router)
 app.include_router(public_product_router)
 app.include_router(cart_router)
 app.include_router(order_router)
 app.include_router(checkout_router)
+app.include_router(report_router)
 
 
 @app.get("/")
@@ -44,6 +100,35 @@ async def root():
     return {"message": "API is connected to the database!"}
 
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    pooled_engines = {"sync": engine, "async": async_engine}
+    if replica_engine is not None:
+        instrument_engine(replica_engine.sync_engine, "replica")
+        pooled_engines["replica"] = replica_engine
+        registry.register_stats("db_reads", "Read-only requests by where they were routed", lambda: dict(read_routing))
+    registry.register_stats("db_pool", "Connection pool state", lambda: pool_stats(pooled_engines), label="engine")
+    registry.register_stats("auth_cache", "Token / principal cache", auth_cache_stats, label="cache")
+    registry.register_stats("token_revocation", "In-memory token revocation list", revocation_list.stats)
+    registry.register_stats("response_cache", "Public catalog response cache", product_response_cache.stats)
+    registry.register_stats("facets", "In-memory catalog facet index", catalog_facets.stats)
+    registry.register_stats("compression", "Response compression", lambda: {encoding: dict(counts) for encoding, counts in compression_stats.items()}, label="encoding")
+    registry.register_stats("cart_summary_cache", "Per-user cart summary cache", cart_summary_cache.stats)
+    registry.register_stats("password_hasher", "bcrypt process pool", password_hasher.stats)
+    registry.register_stats("email_outbox", "Email outbox worker", outbox_worker.stats)
+    registry.register_stats("maintenance", "Periodic maintenance jobs", scheduler.stats, label="job")
+    if rate_limiter:
+        registry.register_stats("rate_limit", "Token-bucket rate limiter", rate_limiter.stats)
+    if load_shedder:
+        registry.register_stats("load_shed", "Event-loop lag based load shedding", load_shedder.stats)
+    registry.register_stats("log", "Queue-backed logging", lambda: {"dropped_records": NonBlockingQueueHandler.dropped})
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
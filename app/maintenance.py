@@ -0,0 +1,54 @@
+# Periodic maintenance jobs, started and stopped by the app lifespan (see app.core.scheduler)
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, or_, select
+from starlette.concurrency import run_in_threadpool
+from app.auth.models import PasswordResetToken
+from app.auth.revocation import purge_expired_revocations
+from app.cart.models import Cart
+from app.core.config import settings
+from app.core.idempotency import purge_expired_keys
+from app.core.ratelimit import purge_buckets
+from app.core.scheduler import Scheduler, delete_in_batches, refresh_table_stats
+from app.products.cache import warm_top_products
+
+HOT_TABLES = ("products", "product_stock_shards", "cart", "orders", "order_items", "sales_daily_product")
+
+
+async def purge_reset_tokens() -> int:  # Expired or already used, neither can reset a password any more
+    now = datetime.now(timezone.utc)
+    return await delete_in_batches(
+        PasswordResetToken,
+        or_(PasswordResetToken.expiration_time <= now, PasswordResetToken.used.is_(True)),
+        settings.MAINTENANCE_DELETE_BATCH_SIZE,
+    )
+
+
+# Whole carts nobody touched for CART_STALE_DAYS: a user's lines go only when even their newest line is
+# that old, so an active cart keeps the items added long ago. Summaries expire on their own.
+async def purge_stale_carts() -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.CART_STALE_DAYS)
+    stale_users = select(Cart.user_id).group_by(Cart.user_id).having(func.max(Cart.updated_at) < cutoff)
+    return await delete_in_batches(Cart, Cart.user_id.in_(stale_users), settings.MAINTENANCE_DELETE_BATCH_SIZE)
+
+
+async def purge_rate_limit_buckets() -> int:  # Off the event loop, the DELETE may wait for the file lock
+    return await run_in_threadpool(purge_buckets, settings.RATE_LIMIT_SQLITE_PATH)
+
+
+async def warm_product_cache() -> int:
+    return await warm_top_products(settings.PRODUCT_WARMUP_COUNT, settings.PRODUCT_WARMUP_DAYS)
+
+
+async def analyze_hot_tables() -> int:
+    return await refresh_table_stats(*HOT_TABLES)
+
+
+scheduler = Scheduler(settings.MAINTENANCE_JITTER)
+scheduler.add("purge_reset_tokens", purge_reset_tokens, settings.RESET_TOKEN_PURGE_INTERVAL_SECONDS)
+scheduler.add("purge_stale_carts", purge_stale_carts, settings.CART_PURGE_INTERVAL_SECONDS)
+scheduler.add("purge_idempotency_keys", purge_expired_keys, settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+scheduler.add("purge_token_revocations", purge_expired_revocations, settings.REVOCATION_PURGE_INTERVAL_SECONDS)
+if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND == "sqlite":  # The bucket file is per host, so not exclusive
+    scheduler.add("purge_rate_limit_buckets", purge_rate_limit_buckets, settings.RATE_LIMIT_PURGE_INTERVAL_SECONDS, exclusive=False)
+scheduler.add("analyze", analyze_hot_tables, settings.ANALYZE_INTERVAL_SECONDS)
+scheduler.add("warm_product_cache", warm_product_cache, settings.PRODUCT_WARMUP_INTERVAL_SECONDS, exclusive=False, initial_delay=0)  # Each worker has its own cache
@@ -0,0 +1,7 @@
+# Every model module, so Base.metadata knows all tables (used by Alembic autogenerate and migrations)
+from app.auth.models import PasswordResetToken, RevokedToken, User
+from app.cart.models import Cart
+from app.core.models import IdempotencyKey, MaintenanceLease, OutboxEmail
+from app.orders.models import Order, OrderItem
+from app.products.models import Product, ProductStockShard
+from app.reports.models import DailyProductSales, DailySales
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, Enum, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, Enum, DateTime, Index, String
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.core.database import Base
@@ -18,18 +18,22 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     total_amount = Column(Float)
     status = Column(Enum(OrderStatus), default=OrderStatus.pending)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True)  # Naive UTC, evaluated per order; indexed for date-range reporting
 
     items = relationship("OrderItem", back_populates="order", cascade="all, delete")
 
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),)  # Order history keyset
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)  # Item loading and per-order aggregates
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer)
     price_at_purchase = Column(Float)
+    product_name = Column(String)  # Snapshot at checkout, so order details need no product lookup and survive catalog edits
+    product_image_url = Column(String)
 
     order = relationship("Order", back_populates="items")
@@ -1,88 +1,176 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from datetime import datetime, timezone
+from typing import List, Optional
+from pydantic import TypeAdapter
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.database import get_async_db, mark_recent_write, product_key, user_key
+from app.core.idempotency import IDEMPOTENCY_HEADER, run_idempotent
 from app.core.logger import logger
+from app.core.pagination import cursor_datetime, cursor_int, decode_cursor, keyset_condition, trim_page
+from app.core.serialization import RowSerializer, json_response
 from app.auth.models import User
-from app.auth.utils import get_current_user, require_role
+from app.auth.utils import get_current_user, get_user_read_db, require_role
+from app.cart.cache import invalidate_cart
 from app.cart.models import Cart
 from app.orders.models import Order, OrderItem, OrderStatus
 from app.orders.schemas import OrderOut, OrderSummary
+from app.products.cache import invalidate_products
+from app.products.facets import catalog_facets
+from app.products.inventory import deduct_sharded_stock
 from app.products.models import Product
+from app.reports.rollup import record_sale
 
 order_router = APIRouter(prefix="/orders", tags=["Orders"])
 checkout_router = APIRouter(prefix="/checkout", tags=["Orders"])
 
 
-# Create order & clear cart
+ORDER = TypeAdapter(OrderOut)
+ORDER_SUMMARIES = RowSerializer(OrderSummary, many=True)
+
+
+# Create order & clear cart. Retries carrying the same Idempotency-Key get the first order back instead of a new one.
 @checkout_router.post("/", response_model=OrderOut)
-def checkout(
-    db: Session = Depends(get_db),
+async def checkout(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("user"))
 ):
-    logger.info(f"[{current_user.email}] - Checkout initiated")
-    cart_items = db.query(Cart).filter(Cart.user_id == current_user.id).all()
+    return await run_idempotent(request, db, current_user.id, idempotency_key, ORDER, lambda record: place_order(db, current_user, record))
+
+
+async def place_order(db: AsyncSession, current_user: User, record) -> Order:
+    logger.info("[%s] - Checkout initiated", current_user.email)
+    cart_items = (await db.scalars(
+        select(Cart).filter(Cart.user_id == current_user.id).with_for_update()  # A parallel checkout of the same cart waits, then finds it empty
+    )).all()
     if not cart_items:
-        logger.warning(f"Checkout failed - Cart empty for user {current_user.email}")
+        logger.warning("Checkout failed - Cart empty for user %s", current_user.email)
         raise HTTPException(status_code=400, detail="Cart is empty")
 
-    total = 0
-    order = Order(user_id=current_user.id)
-    db.add(order)
-    db.flush()  # so we get order.id
-
-    for item in cart_items:  # For every product in the cart
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product ID {item.product_id} not found")
-        
-        logger.debug(f"Checking product stock for {product.name} - Requested: {item.quantity}, Available: {product.stock}") 
-        if product.stock < item.quantity:  # If enough stock not exist as mentioned in cart, then don't checkout that item
+    quantities = {item.product_id: item.quantity for item in cart_items}
+
+    # Regular products are locked in id order so concurrent checkouts can't deadlock. Sharded (hot) products
+    # are not locked at all: their stock is taken from a random counter row further down.
+    products = (await db.scalars(
+        select(Product).filter(Product.id.in_(quantities), Product.stock_shards == 0).order_by(Product.id).with_for_update(of=Product)
+    )).all()
+    sharded = (await db.scalars(
+        select(Product).filter(Product.id.in_(quantities), Product.stock_shards > 0).order_by(Product.id)
+    )).all()
+    products = [*products, *sharded]
+    missing = sorted(quantities.keys() - {product.id for product in products})
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product ID {missing[0]} not found")
+
+    for product in products:
+        logger.debug("Checking product stock for %s - Requested: %s, Available: %s", product.name, quantities[product.id], product.available_stock) 
+        if product.available_stock < quantities[product.id]:  # If enough stock not exist as mentioned in cart, then don't checkout that item
             raise HTTPException(
                 status_code=400,
-                detail=f"Not enough stock for product '{product.name}'. Available: {product.stock}, Requested: {item.quantity}"
+                detail=f"Not enough stock for product '{product.name}'. Available: {product.available_stock}, Requested: {quantities[product.id]}"
             )
-        
-        # Deduct stock here AFTER validation, and checkout
-        product.stock -= item.quantity
-        db.add(OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            quantity=item.quantity,
-            price_at_purchase=product.price
-        ))
-        total += product.price * item.quantity
-
-    order.total_amount = total
-    order.status = OrderStatus.paid  # Simulate payment success (Dummy payment)
-    db.query(Cart).filter(Cart.user_id == current_user.id).delete()
-    
-    db.commit()
-    db.refresh(order)
-    logger.info(f"Order #{order.id} placed by user {current_user.email} | Total: {order.total_amount}")
+
+    # Deduct stock for all regular products in one conditional UPDATE, a product that ran out meanwhile won't match
+    single_row = {product.id: quantities[product.id] for product in products if not product.stock_shards}
+    if single_row:
+        requested = case(single_row, value=Product.id)
+        result = await db.execute(
+            update(Product)
+            .filter(Product.id.in_(single_row), Product.stock >= requested)
+            .values(stock=Product.stock - requested)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(single_row):
+            logger.warning("Checkout failed - Stock changed concurrently for user %s", current_user.email)
+            raise HTTPException(status_code=409, detail="Stock changed during checkout, please try again")
+
+    for product in sharded:
+        if not await deduct_sharded_stock(db, product.id, product.stock_shards, quantities[product.id]):
+            logger.warning("Checkout failed - Sharded stock ran out for product %s, user %s", product.id, current_user.email)
+            raise HTTPException(status_code=409, detail="Stock changed during checkout, please try again")
+
+    placed_at = datetime.now(timezone.utc).replace(tzinfo=None)  # Naive UTC like the column default, its date keys the rollups
+    order = Order(
+        user_id=current_user.id,
+        total_amount=sum(product.price * quantities[product.id] for product in products),
+        status=OrderStatus.paid,  # Simulate payment success (Dummy payment)
+        created_at=placed_at
+    )
+    db.add(order)
+    await db.flush()  # so we get order.id
+
+    await db.execute(insert(OrderItem), [  # Single batched INSERT for all order items
+        {
+            "order_id": order.id,
+            "product_id": product.id,
+            "quantity": quantities[product.id],
+            "price_at_purchase": product.price,
+            "product_name": product.name,
+            "product_image_url": product.image_url
+        }
+        for product in products
+    ])
+    await db.execute(delete(Cart).filter(Cart.user_id == current_user.id))
+    await record_sale(db, placed_at.date(), sorted(((product, quantities[product.id]) for product in products), key=lambda line: line[0].id))
+    await db.refresh(order, attribute_names=["items"])  # Relationships can't lazy load under asyncio
+
+    await record(order)  # Stored with the order, so a retry never places it twice
+    await db.commit()
+    mark_recent_write(user_key(current_user.id))  # The new order must show up in this user's history right away
+    mark_recent_write(*(product_key(product_id) for product_id in quantities))  # Their refilled cache entries must show the new stock
+    invalidate_products(*quantities)  # Cached catalog entries showing these products now have stale stock
+    invalidate_cart(current_user.id)
+    for product_id, quantity in quantities.items():
+        catalog_facets.adjust_stock(product_id, -quantity)
+    logger.info("Order #%s placed by user %s | Total: %s", order.id, current_user.email, order.total_amount)
     return order
 
 
 # Order history of the user
 @order_router.get("/", response_model=List[OrderSummary])
-def order_history(
-    db: Session = Depends(get_db),
+async def order_history(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_user_read_db),  # Replica, or the primary right after this user's checkout
     current_user: User = Depends(require_role("user"))
 ):
-    logger.info(f"[{current_user.email}] - Fetching order history")
-    return db.query(Order).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
+    logger.info("[%s] - Fetching order history", current_user.email)
+    key_columns = [Order.created_at, Order.id]  # Newest first, served by ix_orders_user_id_created_at
+    query = (  # One query for the page: order columns plus item aggregates, no ORM objects or item rows loaded
+        select(
+            Order.id, Order.total_amount, Order.status, Order.created_at,
+            func.count(OrderItem.id).label("item_count"),
+            func.coalesce(func.sum(OrderItem.quantity), 0).label("total_quantity"),
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .filter(Order.user_id == current_user.id)
+        .group_by(Order.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    if cursor:
+        query = query.filter(keyset_condition(key_columns, decode_cursor("orders", cursor, [cursor_datetime, cursor_int]), descending=True))
+
+    orders = (await db.execute(query.limit(limit + 1))).all()
+    orders = trim_page(response, orders, limit, "orders", lambda order: [order.created_at.isoformat(), order.id])
+    return json_response(ORDER_SUMMARIES, orders, response.headers)
 
 
 # Particular order details
 @order_router.get("/{order_id}", response_model=OrderOut)
-def order_detail(
+async def order_detail(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("user"))
 ):
-    logger.info(f"[{current_user.email}] - Fetching details for Order ID {order_id}")
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
+    logger.info("[%s] - Fetching details for Order ID %s", current_user.email, order_id)
+    order = await db.scalar(  # Exactly two queries: the order, then all its items (with name/image snapshots) in one IN query
+        select(Order).options(selectinload(Order.items)).filter(Order.id == order_id, Order.user_id == current_user.id)
+    )
     if not order:
-        logger.warning(f"Order not found: ID {order_id} for user {current_user.email}")
+        logger.warning("Order not found: ID %s for user %s", order_id, current_user.email)
         raise HTTPException(status_code=404, detail="Order not found")
     return order
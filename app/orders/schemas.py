@@ -1,6 +1,6 @@
 from fastapi import Path
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -13,6 +13,8 @@ class OrderItemOut(BaseModel):
     product_id: int = Path(..., ge = 1)
     quantity: int
     price_at_purchase: float
+    product_name: Optional[str] = None  # Empty for orders placed before names were recorded
+    product_image_url: Optional[str] = None
 
     class Config:
         form_attributes = True
@@ -32,6 +34,8 @@ class OrderSummary(BaseModel):
     total_amount: float 
     status: OrderStatus
     created_at: datetime
+    item_count: int  # Distinct products in the order
+    total_quantity: int  # Units across all items
 
     class Config:
         form_attributes = True
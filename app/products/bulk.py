@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+from typing import IO, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import case, func, select, text
+from sqlalchemy.exc import DBAPIError
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal, dialect_insert
+from app.products.models import Product
+from app.products.schemas import ProductCreate
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COLUMNS = ["id", *ProductCreate.model_fields]  # Exported files can be imported again as-is (id makes it an upsert)
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return "ndjson" if content_type in ("application/x-ndjson", "application/jsonl", "application/json") else "csv"
+
+
+def _records(file: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:  # (line number, raw record or parse error)
+    stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items() if key}
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def _validate(record) -> dict:
+    if isinstance(record, Exception):
+        raise ValueError(f"Malformed row: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("Each row must be an object")
+    row = ProductCreate.model_validate(record).model_dump()
+    if record.get("id") is not None:
+        try:
+            row["id"] = int(record["id"])
+        except (TypeError, ValueError):
+            raise ValueError("id must be an integer")
+        if row["id"] < 1:
+            raise ValueError("id must be positive")
+    return row
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line: int, message):
+        self.failed += 1
+        if len(self.errors) < settings.PRODUCT_IMPORT_MAX_REPORTED_ERRORS:  # Counted regardless, listed up to the cap
+            self.errors.append({"line": line, "errors": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed, "created": self.created, "upserted": self.upserted,
+            "failed": self.failed, "errors": self.errors,
+        }
+
+
+# Streams the spooled upload row by row and writes it in batches, one commit per batch, so memory use
+# and transaction size stay bounded. Rows carrying an id update that product (or create it with that id),
+# the rest are plain inserts. A batch the database rejects (e.g. a constraint violation) is rolled back
+# and retried row by row, so only the offending lines fail and are reported. Runs on a worker thread
+# with the sync engine.
+def import_products(file: IO[bytes], fmt: str) -> dict:
+    report = ImportReport()
+    batch_size = settings.PRODUCT_IMPORT_BATCH_SIZE
+    new_rows, upsert_rows = [], {}  # (line, row), and id -> (line, row)
+
+    with SessionLocal() as db:
+        dialect = db.get_bind().dialect.name
+        insert = dialect_insert(dialect)
+
+        def write(new: list, upserts: list):
+            if upserts:  # First, so the serial is moved past explicit ids before this batch's inserts draw from it
+                statement = insert(Product)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Product.id],
+                    set_={
+                        **{column: getattr(statement.excluded, column) for column in ProductCreate.model_fields},
+                        "stock": case((Product.stock_shards > 0, Product.stock), else_=statement.excluded.stock),  # Sharded stock is set via /stock-shards
+                    },
+                )
+                db.execute(statement, upserts)
+                if dialect == "postgresql":  # Explicit ids don't advance the serial, move it past them
+                    db.execute(text("SELECT setval(pg_get_serial_sequence('products', 'id'), :max_id)"), {"max_id": db.scalar(select(func.max(Product.id)))})
+            if new:
+                db.execute(insert(Product), new)
+            db.commit()
+            report.created += len(new)
+            report.upserted += len(upserts)
+
+        def flush():
+            try:
+                write([row for _, row in new_rows], [row for _, row in upsert_rows.values()])
+            except DBAPIError:
+                db.rollback()
+                for line, row in sorted([*new_rows, *upsert_rows.values()], key=lambda item: item[0]):
+                    try:
+                        write([row] if "id" not in row else [], [row] if "id" in row else [])
+                    except DBAPIError as e:
+                        db.rollback()
+                        report.error(line, [{"field": None, "message": str(e.orig).splitlines()[0]}])
+            new_rows.clear()
+            upsert_rows.clear()
+
+        for line, record in _records(file, fmt):
+            report.processed += 1
+            try:
+                row = _validate(record)
+            except ValidationError as e:
+                report.error(line, [{"field": ".".join(map(str, err["loc"])), "message": err["msg"]} for err in e.errors()])
+                continue
+            except ValueError as e:
+                report.error(line, [{"field": None, "message": str(e)}])
+                continue
+
+            if "id" in row:
+                upsert_rows[row["id"]] = (line, row)  # Last occurrence wins, ON CONFLICT can't touch a row twice per statement
+            else:
+                new_rows.append((line, row))
+            if len(new_rows) + len(upsert_rows) >= batch_size:
+                flush()
+        flush()
+    return report.as_dict()
+
+
+def _serialize(rows, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+# Yields the whole catalog through a server-side cursor, one chunk per partition, in constant memory.
+# Opens its own session: request-scoped dependencies are already closed once streaming starts.
+async def export_products(fmt: str):
+    if fmt == "csv":
+        yield _serialize([COLUMNS], fmt)
+    async with AsyncSessionLocal() as db:
+        query = select(*(Product.available_stock if column == "stock" else getattr(Product, column) for column in COLUMNS)).order_by(Product.id)
+        result = await db.stream(query.execution_options(yield_per=settings.PRODUCT_EXPORT_CHUNK_SIZE))
+        async for rows in result.partitions():
+            yield _serialize(rows, fmt)
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.cart.cache import cart_summary_cache, invalidate_carts_with_products
+from app.core.database import CATALOG, product_key, read_session, recently_written
+from app.core.http_cache import ResponseCache
+from app.core.serialization import RowSerializer, json_response
+from app.products.models import Product
+from app.products.schemas import ProductOut
+from app.reports.models import DailyProductSales
+
+# Public catalog responses (GET /products, /products/search, /products/{id})
+product_response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS)
+
+PRODUCT = RowSerializer(ProductOut)
+PRODUCT_LIST = RowSerializer(ProductOut, many=True)
+
+# Selected as plain columns, list pages skip building ORM objects; keys match ProductOut's source attributes
+PRODUCT_COLUMNS = (Product.id, Product.name, Product.description, Product.price, Product.available_stock, Product.category, Product.image_url)
+
+LIST_TAG = "products:list"  # Every listing / search page, any new or edited product may belong on them
+
+
+def product_tag(product_id: int) -> str:  # Detail page plus every listing that currently shows the product
+    return f"product:{product_id}"
+
+
+def list_tags(products) -> set:
+    return {LIST_TAG, *(product_tag(product.id) for product in products)}
+
+
+# Listings are read from the replica even right after a checkout; a page showing a product whose stock
+# just changed may be behind, so it is served but not cached, and the next request reads it again.
+def store_list(request, products, headers):
+    if any(recently_written(product_key(product.id)) for product in products):
+        return json_response(PRODUCT_LIST, products, headers)
+    return product_response_cache.store(request, PRODUCT_LIST, products, list_tags(products), headers)
+
+
+def invalidate_products(*product_ids: int, listings: bool = False) -> None:
+    tags = [product_tag(product_id) for product_id in product_ids]
+    if listings:
+        tags.append(LIST_TAG)
+    product_response_cache.invalidate(*tags)
+    invalidate_carts_with_products(*product_ids)
+
+
+def invalidate_all_products() -> None:  # After bulk changes, cheaper than tagging every product
+    product_response_cache.clear()
+    cart_summary_cache.clear()
+
+
+# Fills the detail entries of the recent best sellers, so the first visitors after a restart, an
+# invalidation or a TTL expiry don't all go to the database at once
+async def warm_top_products(count: int, days: int) -> int:
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    top = (
+        select(DailyProductSales.product_id)
+        .filter(DailyProductSales.day >= since)
+        .group_by(DailyProductSales.product_id)
+        .order_by(func.sum(DailyProductSales.units).desc())
+        .limit(count)
+        .subquery()
+    )
+    async with read_session(CATALOG)() as db:
+        products = (await db.execute(select(*PRODUCT_COLUMNS).join(top, top.c.product_id == Product.id))).all()
+    for product in products:
+        product_response_cache.put(product_response_cache.key(f"/products/{product.id}"), PRODUCT, product, {product_tag(product.id)})
+    return len(products)
@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set
+from sqlalchemy import select
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logger import logger
+from app.products.models import Product
+
+
+class FacetEntry(NamedTuple):
+    category: Optional[str]
+    bucket: int
+    stock: int
+    words: frozenset
+
+
+def search_terms(text: str) -> List[str]:  # Same tokenization as the full-text search
+    return re.findall(r"\w+", (text or "").lower())
+
+
+# In-memory facet index over the whole catalog: per-category product counts and price histograms kept
+# as counters, plus a word -> product ids map for keyword scoping. Admin product routes and checkout
+# apply their changes directly; a periodic full reload picks up changes served by other workers.
+class FacetIndex:
+
+    def __init__(self, price_edges: List[float], refresh_interval: float, cache_size: int):
+        self.edges = sorted(price_edges)
+        self.refresh_interval = refresh_interval
+        self.version = 0  # Bumped on every change, keyword results cached under an older version are stale
+        self.reloads = 0
+        self.reload_errors = 0
+        self.reapplied = 0  # Local changes that landed during a reload and were kept over its snapshot
+        self._changed: List[Set[int]] = []  # One set per running reload: product ids changed here while it reads
+        self._products: Dict[int, FacetEntry] = {}
+        self._counts = defaultdict(lambda: [0] * len(self.edges))  # category -> products per price bucket
+        self._in_stock = defaultdict(lambda: [0] * len(self.edges))
+        self._words: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_words: Optional[List[str]] = None  # For prefix lookups, rebuilt when the vocabulary changes
+        self._cache = TTLCache(cache_size, refresh_interval)
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _bucket(self, price: float) -> int:  # Bucket i holds prices in [edges[i], edges[i + 1])
+        return max(0, bisect.bisect_right(self.edges, price) - 1)
+
+    def _add(self, product_id: int, entry: FacetEntry):
+        self._products[product_id] = entry
+        self._counts[entry.category][entry.bucket] += 1
+        self._in_stock[entry.category][entry.bucket] += entry.stock > 0
+        for word in entry.words:
+            if not self._words[word]:
+                self._sorted_words = None
+            self._words[word].add(product_id)
+
+    def _remove(self, product_id: int):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        self._counts[entry.category][entry.bucket] -= 1
+        self._in_stock[entry.category][entry.bucket] -= entry.stock > 0
+        if not any(self._counts[entry.category]):
+            del self._counts[entry.category], self._in_stock[entry.category]
+        for word in entry.words:
+            self._words[word].discard(product_id)
+            if not self._words[word]:
+                del self._words[word]
+                self._sorted_words = None
+
+    def _touch(self, product_id: int):  # Under the lock, after every local change
+        self.version += 1
+        for changed in self._changed:
+            changed.add(product_id)
+
+    def upsert(self, product_id: int, name: str, category: Optional[str], price: float, stock: int):
+        entry = FacetEntry(category, self._bucket(price), stock, frozenset(search_terms(name) + search_terms(category)))
+        with self._lock:
+            self._remove(product_id)
+            self._add(product_id, entry)
+            self._touch(product_id)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+            self._touch(product_id)
+
+    def adjust_stock(self, product_id: int, delta: int):  # Checkout: only the in-stock counters can move
+        with self._lock:
+            entry = self._products.get(product_id)
+            if entry is None:
+                return
+            self._remove(product_id)
+            self._add(product_id, entry._replace(stock=entry.stock + delta))
+            self._touch(product_id)
+
+    # Rebuilds the index from the database. A local change applied while the rows were being read may or
+    # may not be in them, so the products changed meanwhile keep their current in-memory entries; their
+    # changes from other workers arrive with the next reload.
+    async def reload(self):
+        changed = set()
+        with self._lock:
+            self._changed.append(changed)
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Product.id, Product.name, Product.category, Product.price, Product.available_stock)
+                )).all()
+            fresh = FacetIndex(self.edges, self.refresh_interval, 0)
+            for row in rows:
+                fresh._add(row.id, FacetEntry(row.category, self._bucket(row.price), row.available_stock, frozenset(search_terms(row.name) + search_terms(row.category))))
+            with self._lock:
+                for product_id in changed:
+                    fresh._remove(product_id)
+                    if product_id in self._products:
+                        fresh._add(product_id, self._products[product_id])
+                self.reapplied += len(changed)
+                self._products, self._counts, self._in_stock, self._words = fresh._products, fresh._counts, fresh._in_stock, fresh._words
+                self._sorted_words = None
+                self.version += 1
+        finally:
+            with self._lock:
+                self._changed = [other for other in self._changed if other is not changed]  # By identity, empty sets compare equal
+        self.reloads += 1
+
+    def _matching(self, keyword: str) -> Set[int]:  # Every term is a prefix of some word, like the tsquery "term:*"
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._words)
+        matches = None
+        for term in search_terms(keyword):
+            ids = set()
+            for index in range(bisect.bisect_left(self._sorted_words, term), len(self._sorted_words)):
+                word = self._sorted_words[index]
+                if not word.startswith(term):
+                    break
+                ids |= self._words[word]
+            matches = ids if matches is None else matches & ids
+        return matches or set()
+
+    # Category counts ignore the category filter, so the sidebar can offer the other categories;
+    # totals and the price histogram apply it.
+    def facets(self, keyword: Optional[str] = None, category: Optional[str] = None) -> dict:
+        if keyword:
+            cached = self._cache.get((keyword.lower(), category))
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+
+        with self._lock:
+            version = self.version
+            if keyword:
+                counts = defaultdict(lambda: [0] * len(self.edges))
+                in_stock = defaultdict(lambda: [0] * len(self.edges))
+                for product_id in self._matching(keyword):
+                    entry = self._products[product_id]
+                    counts[entry.category][entry.bucket] += 1
+                    in_stock[entry.category][entry.bucket] += entry.stock > 0
+            else:
+                counts, in_stock = self._counts, self._in_stock
+            categories = [
+                {"category": name, "count": sum(buckets), "in_stock": sum(in_stock[name])}
+                for name, buckets in counts.items() if any(buckets)
+            ]
+            scoped = [counts.get(category, [0] * len(self.edges))] if category else list(counts.values())
+            scoped_in_stock = [in_stock.get(category, [0] * len(self.edges))] if category else list(in_stock.values())
+            histogram = [sum(buckets[index] for buckets in scoped) for index in range(len(self.edges))]
+            total_in_stock = sum(sum(buckets) for buckets in scoped_in_stock)
+
+        categories.sort(key=lambda row: (-row["count"], row["category"] or ""))
+        result = {
+            "total": sum(histogram),
+            "in_stock": total_in_stock,
+            "categories": categories,
+            "price_histogram": [
+                {"min": low, "max": self.edges[index + 1] if index + 1 < len(self.edges) else None, "count": histogram[index]}
+                for index, low in enumerate(self.edges)
+            ],
+        }
+        if keyword:
+            self._cache.set((keyword.lower(), category), (version, result))
+        return result
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception:  # Keep serving the counters we have
+                self.reload_errors += 1
+                logger.warning("Facet index reload failed", exc_info=True)
+
+    def stats(self) -> dict:
+        return {"products": len(self._products), "words": len(self._words), "reloads": self.reloads, "reload_errors": self.reload_errors, "reapplied": self.reapplied}
+
+
+catalog_facets = FacetIndex(settings.FACET_PRICE_BUCKETS, settings.FACETS_REFRESH_SECONDS, settings.FACET_CACHE_MAX_ENTRIES)
@@ -0,0 +1,74 @@
+import random
+from typing import List
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.products.models import Product, ProductStockShard
+
+
+def split_stock(total: int, shards: int) -> List[int]:  # As even as possible, remainder on the first shards
+    base, extra = divmod(total, shards)
+    return [base + (1 if index < extra else 0) for index in range(shards)]
+
+
+# Switches a product between single-row stock (shards=0) and N counter rows, keeping its total
+# (or setting it to `total`). The caller commits.
+async def reshard_stock(db: AsyncSession, product: Product, shards: int, total: int = None) -> int:
+    await db.execute(select(Product.id).filter(Product.id == product.id).with_for_update())  # Serializes concurrent reshards
+    # Checkout doesn't lock the product row of a sharded product, only the shard it takes from. Locking the
+    # shards waits for those deductions to commit, so the total below includes them and none lands on a
+    # shard that is about to be replaced.
+    await db.execute(
+        select(ProductStockShard.shard).filter(ProductStockShard.product_id == product.id).order_by(ProductStockShard.shard).with_for_update()
+    )
+    if total is None:
+        total = await db.scalar(select(Product.available_stock).filter(Product.id == product.id))
+
+    await db.execute(delete(ProductStockShard).filter(ProductStockShard.product_id == product.id))
+    if shards:
+        await db.execute(insert(ProductStockShard), [
+            {"product_id": product.id, "shard": shard, "stock": stock}
+            for shard, stock in enumerate(split_stock(total, shards))
+        ])
+    product.stock = 0 if shards else total
+    product.stock_shards = shards
+    return total
+
+
+# Takes `quantity` from one random shard; only when that shard is short are all shards locked and
+# drained in order. Returns False if the product doesn't have enough stock left in total.
+async def deduct_sharded_stock(db: AsyncSession, product_id: int, shards: int, quantity: int) -> bool:
+    result = await db.execute(
+        update(ProductStockShard)
+        .filter(
+            ProductStockShard.product_id == product_id,
+            ProductStockShard.shard == random.randrange(shards),
+            ProductStockShard.stock >= quantity,
+        )
+        .values(stock=ProductStockShard.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return True
+
+    rows = (await db.execute(
+        select(ProductStockShard.shard, ProductStockShard.stock)
+        .filter(ProductStockShard.product_id == product_id, ProductStockShard.stock > 0)
+        .order_by(ProductStockShard.shard)
+        .with_for_update()
+    )).all()
+    if sum(row.stock for row in rows) < quantity:
+        return False
+
+    remaining = quantity
+    for row in rows:
+        taken = min(row.stock, remaining)
+        await db.execute(
+            update(ProductStockShard)
+            .filter(ProductStockShard.product_id == product_id, ProductStockShard.shard == row.shard)
+            .values(stock=ProductStockShard.stock - taken)
+            .execution_options(synchronize_session=False)
+        )
+        remaining -= taken
+        if not remaining:
+            break
+    return True
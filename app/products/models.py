@@ -1,6 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Index, case, func, literal_column, select
+from sqlalchemy.orm import column_property
 from app.core.database import Base
 
+
+# Full-text document for /products/search (name weighted above category).
+# Literals are inlined so the query expression matches the index expression exactly.
+def _weighted_tsvector(column, weight: str):
+    document = func.to_tsvector(literal_column("'simple'::regconfig"), func.coalesce(column, literal_column("''")))
+    return func.setweight(document, literal_column(f"'{weight}'"))
+
+def search_document(name, category):
+    return _weighted_tsvector(name, "A").op("||")(_weighted_tsvector(category, "B"))
+
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -8,6 +20,41 @@ class Product(Base):
     name = Column(String, nullable=False)
     description = Column(String)
     price = Column(Float, nullable=False)
-    stock = Column(Integer, default=0)
+    stock = Column(Integer, default=0)  # Unused (0) while the product is sharded, read available_stock instead
     category = Column(String)
-    image_url = Column(String)
\ No newline at end of file
+    image_url = Column(String)
+    stock_shards = Column(Integer, default=0, nullable=False, server_default="0")  # >0: stock lives in product_stock_shards
+
+    __table_args__ = (
+        Index("ix_products_category_price", "category", "price", "id"),  # Category listing sorted by price, keyset on (price, id)
+        Index("ix_products_category_name", "category", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),  # Whole-catalog listing sorted by price / name
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_search_vector", search_document(name, category), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+
+# Stock of a hot product split across counter rows, so concurrent checkouts lock different rows
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    stock = Column(Integer, nullable=False, default=0)
+
+
+search_vector = search_document(Product.name, Product.category)
+
+# Stock as customers see it: the column for regular products, the sum of the shards for sharded ones
+Product.available_stock = column_property(
+    case(
+        (
+            Product.stock_shards > 0,
+            select(func.coalesce(func.sum(ProductStockShard.stock), 0))
+            .where(ProductStockShard.product_id == Product.id)
+            .correlate_except(ProductStockShard)
+            .scalar_subquery(),
+        ),
+        else_=Product.stock,
+    )
+)
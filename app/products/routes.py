@@ -1,150 +1,284 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import CATALOG, get_async_db, get_product_read_db, get_read_db, mark_recent_write
 from app.core.logger import logger
-from app.products.schemas import ProductCreate, ProductOut, ProductUpdate
+from app.core.config import settings
+from app.core.pagination import cursor_float, cursor_int, cursor_str, decode_cursor, keyset_condition, trim_page
+from app.core.serialization import json_response
+from app.products.schemas import ProductCreate, ProductFacets, ProductOut, ProductUpdate, StockShardsUpdate
 from app.products.models import Product
+from app.products.bulk import FORMATS, detect_format, export_products, import_products
+from app.products.inventory import reshard_stock
+from app.products.cache import PRODUCT, PRODUCT_COLUMNS, PRODUCT_LIST, invalidate_all_products, invalidate_products, product_response_cache, product_tag, store_list
+from app.products.facets import catalog_facets
+from app.products.search import build_search_query
 from app.auth.utils import require_role
 from app.auth.models import User
 
 admin_router = APIRouter(prefix="/admin/products", tags=["Admin Products"])
 public_router = APIRouter(prefix="/products", tags=["Public Products"])
 
+SORT_KEY_PARSERS = {"price": cursor_float, "name": cursor_str}  # Cursor value checks per sort_by
+
 
 # APIs can be accessed by Admins only
 # Create product
 @admin_router.post("/", response_model=ProductOut)
-def create_product(
+async def create_product(
     product: ProductCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin"))
 ):
     new_product = Product(**product.model_dump())
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    await db.commit()
+    await db.refresh(new_product, attribute_names=["available_stock"])  # SQL expression, only known after a read
+    mark_recent_write(CATALOG)  # Else the emptied cache could refill from a replica that hasn't seen it yet
+    invalidate_products(listings=True)  # New product may belong on any cached listing
+    catalog_facets.upsert(new_product.id, new_product.name, new_product.category, new_product.price, new_product.available_stock)
 
-    logger.info(f"Admin {current_user.email} created new product: {product.name}")
+    logger.info("Admin %s created new product: %s", current_user.email, product.name)
     return new_product
 
 
 # Get all products (paginated)
 @admin_router.get("/", response_model=List[ProductOut])
-def get_all_products(
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db),
+async def get_all_products(
+    response: Response,
+    skip: int = Query(0, ge=0, le=settings.MAX_PAGINATION_OFFSET, deprecated=True),  # Kept for old clients, use cursor instead
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    logger.info("Admin %s fetching all products | skip=%s limit=%s cursor=%s", current_user.email, skip, limit, cursor)
+    query = select(*PRODUCT_COLUMNS).order_by(Product.id)
+    if cursor:
+        query = query.filter(keyset_condition([Product.id], decode_cursor("admin-products", cursor, [cursor_int])))
+    else:
+        query = query.offset(skip)
+
+    products = (await db.execute(query.limit(limit + 1))).all()
+    products = trim_page(response, products, limit, "admin-products", lambda product: [product.id])
+    return json_response(PRODUCT_LIST, products, response.headers)
+
+
+# Bulk import from CSV (header row) or NDJSON, streamed from the request body
+@admin_router.post("/import")
+async def import_catalog(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),  # Defaults from Content-Type
     current_user: User = Depends(require_role("admin"))
 ):
-    logger.info(f"Admin {current_user.email} fetching all products | skip={skip} limit={limit}")
-    return db.query(Product).offset(skip).limit(limit).all()
+    fmt = format or detect_format(request.headers.get("content-type"))
+    logger.info("Admin %s importing products (%s)", current_user.email, fmt)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:  # Large uploads spill to disk
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        report = await run_in_threadpool(import_products, upload, fmt)
+
+    if report["created"] or report["upserted"]:
+        mark_recent_write(CATALOG)
+        invalidate_all_products()
+        await catalog_facets.reload()
+    logger.info("Product import by %s: %s created, %s upserted, %s failed", current_user.email, report["created"], report["upserted"], report["failed"])
+    return report
+
+
+# Bulk export of the whole catalog, streamed
+@admin_router.get("/export")
+async def export_catalog(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(require_role("admin"))
+):
+    logger.info("Admin %s exporting products (%s)", current_user.email, format)
+    return StreamingResponse(
+        export_products(format),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
 
 # Get product by ID
 @admin_router.get("/{product_id}", response_model=ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(require_role("admin"))):
-    logger.info(f"Admin {current_user.email} fetching product ID: {product_id}")
-    product = db.query(Product).filter(Product.id == product_id).first()
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(require_role("admin"))):
+    logger.info("Admin %s fetching product ID: %s", current_user.email, product_id)
+    product = await db.get(Product, product_id)
     if not product:
-        logger.warning(f"Product not found: ID {product_id}")
+        logger.warning("Product not found: ID %s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 
 # Update product details
 @admin_router.put("/{product_id}", response_model=ProductOut)
-def update_product(
+async def update_product(
     product_id: int,
     updated_data: ProductUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(require_role("admin"))
 ):
-    logger.info(f"Admin {current_user.email} updating product ID: {product_id}")
-    product = db.query(Product).filter(Product.id == product_id).first()
+    logger.info("Admin %s updating product ID: %s", current_user.email, product_id)
+    product = await db.get(Product, product_id)
     if not product:
-        logger.warning(f"Product not found for update: ID {product_id}")
+        logger.warning("Product not found for update: ID %s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
 
-    logger.debug(f"Updating fields: {updated_data.model_dump(exclude_unset=True)}")
-    for field, value in updated_data.model_dump(exclude_unset=True).items():
-        setattr(product, field, value)
+    changes = updated_data.model_dump(exclude_unset=True)
+    logger.debug("Updating fields: %s", changes)
+    for field, value in changes.items():
+        if field == "stock" and product.stock_shards:  # Spread the new total over the product's shards
+            await reshard_stock(db, product, product.stock_shards, value)
+        else:
+            setattr(product, field, value)
 
-    db.commit()
-    db.refresh(product)
-    logger.info(f"Product updated successfully: ID {product_id}")
+    await db.commit()
+    await db.refresh(product, attribute_names=["available_stock"])  # Expired by the flush, can't lazy load under asyncio
+    mark_recent_write(CATALOG)
+    invalidate_products(product_id, listings=bool(changes.keys() - {"stock"}))  # Stock-only edits can't move it between listings
+    catalog_facets.upsert(product.id, product.name, product.category, product.price, product.available_stock)
+    logger.info("Product updated successfully: ID %s", product_id)
     return product
 
 
+# Split a hot product's stock across N counter rows (or merge it back with 0), checkouts then stop serializing on its row
+@admin_router.put("/{product_id}/stock-shards")
+async def set_stock_shards(
+    product_id: int,
+    body: StockShardsUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    product = await db.get(Product, product_id)
+    if not product:
+        logger.warning("Product not found for stock sharding: ID %s", product_id)
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    total = await reshard_stock(db, product, body.shards)
+    await db.commit()
+    mark_recent_write(CATALOG)
+    invalidate_products(product_id)
+    catalog_facets.upsert(product.id, product.name, product.category, product.price, total)
+    logger.info("Admin %s set %s stock shard(s) for product ID %s (stock %s)", current_user.email, body.shards, product_id, total)
+    return {"product_id": product_id, "stock_shards": body.shards, "stock": total}
+
+
 # Delete product
 @admin_router.delete("/{product_id}")
-def delete_product(
+async def delete_product(
     product_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(require_role("admin"))
 ):
-    logger.info(f"Admin {current_user.email} deleting product ID: {product_id}")
-    product = db.query(Product).filter(Product.id == product_id).first()
+    logger.info("Admin %s deleting product ID: %s", current_user.email, product_id)
+    product = await db.get(Product, product_id)
     if not product:
-        logger.warning(f"Delete failed - Product not found: ID {product_id}")
+        logger.warning("Delete failed - Product not found: ID %s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
 
-    db.delete(product)
-    db.commit()
-    logger.info(f"Product deleted: ID {product_id}")
+    await db.delete(product)
+    await db.commit()
+    mark_recent_write(CATALOG)
+    invalidate_products(product_id, listings=True)
+    catalog_facets.remove(product_id)
+    logger.info("Product deleted: ID %s", product_id)
     return {"message": "Product deleted successfully"}
 
 
 # APIs can be accessed by Anyone
 # Get All Products (with pagination, sort, filter)
 @public_router.get("/", response_model=List[ProductOut])
-def public_get_products(
-    skip: int = 0,  # Pagination
-    limit: int = 10,  
+async def public_get_products(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, le=settings.MAX_PAGINATION_OFFSET, deprecated=True),  # Pagination, use cursor for deep pages
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
     category: Optional[str] = None,  # Filtering
     sort_by: Optional[str] = Query(None, enum=["price", "name"]),  # Sorting
     order: Optional[str] = Query("asc", enum=["asc", "desc"]),  # Order direction
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    logger.info(f"Fetching public products | category={category} min_price={min_price} max_price={max_price} sort_by={sort_by} order={order}")
-    query = db.query(Product)
+    logger.info("Fetching public products | category=%s min_price=%s max_price=%s sort_by=%s order=%s", category, min_price, max_price, sort_by, order)
+    cached = product_response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    query = select(*PRODUCT_COLUMNS)
 
     if category:
         query = query.filter(Product.category == category)
-    if sort_by:
-        column = getattr(Product, sort_by)
-        query = query.order_by(column.asc() if order == "asc" else column.desc())
     if min_price is not None:
         query = query.filter(Product.price >= min_price)
     if max_price is not None:
         query = query.filter(Product.price <= max_price)
-        
-    products = query.offset(skip).limit(limit).all()
-    return products
 
+    # Keyset on the active sort with id as tie-breaker, e.g. (category, price, id) is served by one index
+    key_columns = [getattr(Product, sort_by), Product.id] if sort_by else [Product.id]
+    key_parsers = [SORT_KEY_PARSERS[sort_by], cursor_int] if sort_by else [cursor_int]
+    descending = bool(sort_by) and order == "desc"
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in key_columns))
+
+    scope = f"products:{sort_by or 'id'}:{order}"
+    if cursor:
+        query = query.filter(keyset_condition(key_columns, decode_cursor(scope, cursor, key_parsers), descending))
+    else:
+        query = query.offset(skip)
+
+    products = (await db.execute(query.limit(limit + 1))).all()
+    products = trim_page(response, products, limit, scope, lambda product: [getattr(product, column.key) for column in key_columns])
+    return store_list(request, products, response.headers)
 
-# Search Products by Name or Category
+
+# Search Products by Name or Category (ranked by relevance, cursor paginated)
 @public_router.get("/search", response_model=List[ProductOut])
-def search_products(
+async def search_products(
     keyword: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    logger.info(f"Searching products with keyword: '{keyword}'")
-    query = db.query(Product).filter(
-        (Product.name.ilike(f"%{keyword}%")) |
-        (Product.category.ilike(f"%{keyword}%"))
-    )
-    return query.all()
+    logger.info("Searching products with keyword: '%s' limit=%s", keyword, limit)
+    cached = product_response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    scope = f"search:{keyword}"
+    after = decode_cursor(scope, cursor, [cursor_float, cursor_int]) if cursor else None  # (rank, id)
+    query = build_search_query(db.bind.dialect.name, keyword, limit + 1, after, PRODUCT_COLUMNS)
+    rows = (await db.execute(query)).all() if query is not None else []
+    products = trim_page(response, rows, limit, scope, lambda row: [row.rank, row.id])
+    return store_list(request, products, response.headers)
+
+
+# Category counts and a price histogram for the filter sidebar, optionally scoped to a keyword or category.
+# Served from the in-memory facet index, no query per request.
+@public_router.get("/facets", response_model=ProductFacets)
+async def product_facets(keyword: Optional[str] = None, category: Optional[str] = None):
+    logger.info("Fetching product facets | keyword=%s category=%s", keyword, category)
+    return catalog_facets.facets(keyword, category)
 
 
 # Get Product by ID
 @public_router.get("/{product_id}", response_model=ProductOut)
-def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching public product ID: {product_id}")
-    product = db.query(Product).filter(Product.id == product_id).first()
+async def get_product_by_id(product_id: int, request: Request, db: AsyncSession = Depends(get_product_read_db)):
+    logger.info("Fetching public product ID: %s", product_id)
+    cached = product_response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    product = await db.get(Product, product_id)
     if not product:
-        logger.warning(f"Product not found: ID {product_id}")
+        logger.warning("Product not found: ID %s", product_id)
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return product_response_cache.store(request, PRODUCT, product, {product_tag(product_id)})
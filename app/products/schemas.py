@@ -1,6 +1,6 @@
 from fastapi import Path
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import AliasChoices, BaseModel, Field
+from typing import List, Optional
 
 class ProductCreate(BaseModel):
     name: str
@@ -20,6 +20,26 @@ class ProductUpdate(BaseModel):
 
 class ProductOut(ProductCreate):
     id: int = Path(..., ge = 1)
+    stock: int = Field(..., validation_alias=AliasChoices("available_stock", "stock"))  # Shard total for sharded products
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class StockShardsUpdate(BaseModel):
+    shards: int = Field(..., ge=0, le=64)  # 0 moves the stock back onto the product row
+
+class CategoryFacet(BaseModel):
+    category: Optional[str] = None
+    count: int
+    in_stock: int
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None  # Open-ended last bucket
+    count: int
+
+class ProductFacets(BaseModel):
+    total: int
+    in_stock: int
+    categories: List[CategoryFacet]
+    price_histogram: List[PriceBucket]
@@ -0,0 +1,38 @@
+import re
+from sqlalchemy import Float, and_, case, cast, func, literal_column, or_, select
+from app.products.models import Product, search_vector
+
+
+# PostgreSQL: prefix-matching tsquery over the GIN-indexed search_vector, ranked with ts_rank_cd
+def _full_text_query(keyword: str):
+    terms = re.findall(r"\w+", keyword.lower())
+    if not terms:
+        return None, None
+    tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{term}:*" for term in terms))
+    rank = cast(func.ts_rank_cd(search_vector, tsquery), Float)  # float8, so cursor values compare exactly
+    return search_vector.op("@@")(tsquery), rank
+
+
+# Other backends (SQLite in development): substring match ranked by where the keyword hits
+def _substring_query(keyword: str):
+    pattern = f"%{keyword}%"
+    match = Product.name.ilike(pattern) | Product.category.ilike(pattern)
+    rank = case(
+        (Product.name.ilike(keyword), 4.0),
+        (Product.name.ilike(f"{keyword}%"), 3.0),
+        (Product.name.ilike(pattern), 2.0),
+        else_=1.0
+    )
+    return match, rank
+
+
+def build_search_query(dialect: str, keyword: str, limit: int, after: list = None, columns: tuple = (Product,)):
+    match, rank = _full_text_query(keyword) if dialect == "postgresql" else _substring_query(keyword)
+    if match is None:
+        return None
+
+    query = select(*columns, rank.label("rank")).filter(match)
+    if after:  # Keyset: continue below the last (rank, id) seen
+        last_rank, last_id = after
+        query = query.filter(or_(rank < last_rank, and_(rank == last_rank, Product.id > last_id)))
+    return query.order_by(rank.desc(), Product.id).limit(limit)
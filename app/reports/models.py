@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Date, Float, Integer, String
+from app.core.database import Base
+
+
+# Sales rollups, maintained by checkout in the order's own transaction (app.reports.rollup) and rebuilt
+# from order history with `python -m app.reports.rebuild`. Each day is split over SALES_ROLLUP_SHARDS rows
+# picked at random per order, so concurrent checkouts don't all queue on the same row; reports sum them.
+class DailySales(Base):
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class DailyProductSales(Base):
+    __tablename__ = "sales_daily_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)  # No FK: figures for deleted products stay in the totals
+    shard = Column(Integer, primary_key=True)
+    category = Column(String)  # Category at the time of the latest sale counted in this row
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
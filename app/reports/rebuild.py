@@ -0,0 +1,15 @@
+# Backfills the sales rollups from order history, e.g. after first deploying them or fixing orders by hand.
+#
+#   python -m app.reports.rebuild                                  # all history
+#   python -m app.reports.rebuild --start 2026-01-01 --end 2026-01-31
+import argparse
+from datetime import date
+from app.reports.rollup import rebuild_sales_rollups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollup tables")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    result = rebuild_sales_rollups(args.start, args.end)
+    print(f"Rebuilt {result['days']} day rows and {result['product_days']} product-day rows")
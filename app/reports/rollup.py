@@ -0,0 +1,88 @@
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import delete, func, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.orders.models import Order, OrderItem, OrderStatus
+from app.products.models import Product
+from app.reports.models import DailyProductSales, DailySales
+
+
+# Adds one order to the rollups, inside the checkout's transaction so the figures commit (or roll back)
+# with the order itself. lines are (product, quantity) pairs, already sorted by product id so two
+# checkouts always lock rollup rows in the same order.
+async def record_sale(db: AsyncSession, day: date, lines: Iterable[Tuple[Product, int]]) -> None:
+    insert = dialect_insert(db.bind.dialect.name)
+    shard = random.randrange(settings.SALES_ROLLUP_SHARDS)
+    rows = [
+        {"day": day, "product_id": product.id, "shard": shard, "category": product.category, "units": quantity, "revenue": product.price * quantity}
+        for product, quantity in lines
+    ]
+
+    totals = insert(DailySales).values(
+        day=day, shard=shard, orders=1, units=sum(row["units"] for row in rows), revenue=sum(row["revenue"] for row in rows)
+    )
+    await db.execute(totals.on_conflict_do_update(
+        index_elements=["day", "shard"],
+        set_={
+            "orders": DailySales.orders + 1,
+            "units": DailySales.units + totals.excluded.units,
+            "revenue": DailySales.revenue + totals.excluded.revenue,
+        },
+    ))
+
+    per_product = insert(DailyProductSales)
+    await db.execute(per_product.on_conflict_do_update(
+        index_elements=["day", "product_id", "shard"],
+        set_={
+            "category": per_product.excluded.category,
+            "units": DailyProductSales.units + per_product.excluded.units,
+            "revenue": DailyProductSales.revenue + per_product.excluded.revenue,
+        },
+    ), rows)
+
+
+# Recomputes the rollups for [start, end] (default: all history) from paid orders, into shard 0. On
+# PostgreSQL the rollup tables are locked for the duration, so checkouts committing meanwhile are
+# counted exactly once: either in the recomputed rows or by their own upsert right after.
+def rebuild_sales_rollups(start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    day = func.date(Order.created_at)
+    order_filter = [Order.status == OrderStatus.paid, OrderItem.product_id.isnot(None)]
+    daily_filter, product_filter = [], []
+    if start:
+        order_filter.append(Order.created_at >= datetime.combine(start, time.min))
+        daily_filter.append(DailySales.day >= start)
+        product_filter.append(DailyProductSales.day >= start)
+    if end:
+        order_filter.append(Order.created_at < datetime.combine(end + timedelta(days=1), time.min))
+        daily_filter.append(DailySales.day <= end)
+        product_filter.append(DailyProductSales.day <= end)
+
+    with SessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE sales_daily, sales_daily_product IN EXCLUSIVE MODE"))
+        db.execute(delete(DailySales).filter(*daily_filter))
+        db.execute(delete(DailyProductSales).filter(*product_filter))
+
+        revenue = func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+        days = db.execute(DailySales.__table__.insert().from_select(
+            ["day", "shard", "orders", "units", "revenue"],
+            select(day, literal(0), func.count(Order.id.distinct()), func.sum(OrderItem.quantity), revenue)
+            .select_from(Order)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .filter(*order_filter)
+            .group_by(day),
+        )).rowcount
+        products = db.execute(DailyProductSales.__table__.insert().from_select(
+            ["day", "product_id", "shard", "category", "units", "revenue"],
+            select(day, OrderItem.product_id, literal(0), func.max(Product.category), func.sum(OrderItem.quantity), revenue)
+            .select_from(Order)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)  # Current category; deleted products keep none
+            .filter(*order_filter)
+            .group_by(day, OrderItem.product_id),
+        )).rowcount
+        db.commit()
+    return {"days": days, "product_days": products}
@@ -0,0 +1,97 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.models import User
+from app.auth.utils import require_role
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.logger import logger
+from app.products.models import Product
+from app.reports.models import DailyProductSales, DailySales
+from app.reports.schemas import CategorySales, DailyRevenue, ProductSales
+
+router = APIRouter(prefix="/admin/reports", tags=["Admin Reports"])
+
+
+# Inclusive UTC date range, the last 30 days by default
+def date_range(start: Optional[date] = None, end: Optional[date] = None) -> Tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= settings.REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {settings.REPORT_MAX_DAYS} days")
+    return start, end
+
+
+# All reports read the rollup tables only, never orders / order_items
+# Revenue, orders and units per day
+@router.get("/revenue/daily", response_model=List[DailyRevenue])
+async def revenue_per_day(
+    period: Tuple[date, date] = Depends(date_range),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    logger.info("Admin %s fetching daily revenue %s..%s", current_user.email, *period)
+    rows = await db.execute(
+        select(
+            DailySales.day,
+            func.sum(DailySales.orders).label("orders"),
+            func.sum(DailySales.units).label("units"),
+            func.sum(DailySales.revenue).label("revenue"),
+        )
+        .filter(DailySales.day.between(*period))
+        .group_by(DailySales.day)
+        .order_by(DailySales.day)
+    )
+    return rows.all()
+
+
+# Best selling products by revenue or units
+@router.get("/products/top", response_model=List[ProductSales])
+async def top_products(
+    period: Tuple[date, date] = Depends(date_range),
+    limit: int = Query(10, ge=1, le=100),
+    by: str = Query("revenue", enum=["revenue", "units"]),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    logger.info("Admin %s fetching top %s products by %s %s..%s", current_user.email, limit, by, *period)
+    totals = (
+        select(
+            DailyProductSales.product_id,
+            func.sum(DailyProductSales.units).label("units"),
+            func.sum(DailyProductSales.revenue).label("revenue"),
+        )
+        .filter(DailyProductSales.day.between(*period))
+        .group_by(DailyProductSales.product_id)
+        .order_by(func.sum(getattr(DailyProductSales, by)).desc(), DailyProductSales.product_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = await db.execute(  # Names for the top N only
+        select(totals.c.product_id, Product.name, totals.c.units, totals.c.revenue)
+        .outerjoin(Product, Product.id == totals.c.product_id)
+        .order_by(totals.c[by].desc(), totals.c.product_id)
+    )
+    return rows.all()
+
+
+# Revenue and units per category
+@router.get("/categories", response_model=List[CategorySales])
+async def revenue_per_category(
+    period: Tuple[date, date] = Depends(date_range),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    logger.info("Admin %s fetching category revenue %s..%s", current_user.email, *period)
+    revenue = func.sum(DailyProductSales.revenue)
+    rows = await db.execute(
+        select(DailyProductSales.category, func.sum(DailyProductSales.units).label("units"), revenue.label("revenue"))
+        .filter(DailyProductSales.day.between(*period))
+        .group_by(DailyProductSales.category)
+        .order_by(revenue.desc())
+    )
+    return rows.all()
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class DailyRevenue(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None  # Empty once the product has been deleted
+    units: int
+    revenue: float
+
+class CategorySales(BaseModel):
+    category: Optional[str] = None
+    units: int
+    revenue: float
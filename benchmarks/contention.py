@@ -0,0 +1,107 @@
+# Flash-sale contention benchmark: many users checking out the same product at once, with its stock
+# on a single row versus split across counter shards.
+#
+#   python -m benchmarks.contention --database-url postgresql+psycopg2://postgres:pw@localhost/bench \
+#       --users 2000 --concurrency 64 --shards 0,4,16
+#
+# Every user has one unit of the hot product in their cart and checks out exactly once per mode.
+# Use PostgreSQL: SQLite serializes all writers, so the modes can't differ there.
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.run import configure_environment, percentile
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hot-product checkout contention benchmark")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--shards", default="0,8", help="Shard counts to compare, 0 is the single-row mode")
+    return parser.parse_args()
+
+
+def prepare_round(data: dict, product_id: int):  # Fresh carts holding the hot product for every user
+    from sqlalchemy import delete, insert, select
+    from app.auth.models import User
+    from app.cart.models import Cart
+    from app.core.database import SessionLocal
+
+    with SessionLocal() as db:
+        db.execute(delete(Cart))
+        user_ids = db.scalars(select(User.id).filter(User.email.in_(data["user_emails"]))).all()
+        db.execute(insert(Cart), [{"user_id": user_id, "product_id": product_id, "quantity": 1} for user_id in user_ids])
+        db.commit()
+
+
+async def set_shards(product_id: int, shards: int, stock: int):
+    from app.core.database import AsyncSessionLocal
+    from app.products.inventory import reshard_stock
+    from app.products.models import Product
+
+    async with AsyncSessionLocal() as db:
+        product = await db.get(Product, product_id)
+        await reshard_stock(db, product, shards, stock)
+        await db.commit()
+
+
+async def run_mode(client, tokens: list, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    pending = list(tokens)
+
+    async def worker():
+        while pending:
+            token = pending.pop()
+            started = time.perf_counter()
+            response = await client.post("/checkout/", headers={"Authorization": f"Bearer {token}"})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "checkouts_per_second": statuses.get(200, 0) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "statuses": statuses,
+    }
+
+
+async def drive(args, data: dict) -> dict:
+    import httpx
+    from app.auth.utils import create_access_token
+    from app.main import app
+
+    product_id = data["product_ids"][0]
+    tokens = [create_access_token({"sub": email, "role": "user"}) for email in data["user_emails"]]
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for shards in (int(value) for value in args.shards.split(",")):
+                prepare_round(data, product_id)
+                await set_shards(product_id, shards, stock=len(tokens))  # Exactly enough: the last shards drain too
+                results[shards] = await run_mode(client, tokens, args.concurrency)
+    return results
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    from benchmarks.seed import seed
+
+    data = seed(products=1, users=args.users, orders_per_user=0, cart_lines=0)
+    results = asyncio.run(drive(args, data))
+
+    print(f"\n{'mode':<16}{'checkouts/s':>14}{'p50 ms':>10}{'p95 ms':>10}  statuses")
+    for shards, row in results.items():
+        mode = f"{shards} shards" if shards else "single row"
+        print(f"{mode:<16}{row['checkouts_per_second']:>14.1f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}  {row['statuses']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
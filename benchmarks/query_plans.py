@@ -0,0 +1,147 @@
+# Query-plan check: drives each hot route once, captures the SQL it runs and EXPLAINs every read /
+# update against the migrated schema. Fails when a statement scans a whole table instead of using an index.
+#
+#   python -m benchmarks.query_plans
+#   python -m benchmarks.query_plans --database-url postgresql+psycopg2://postgres:pw@localhost/bench
+#
+# PostgreSQL runs with enable_seqscan=off, so a Seq Scan left in a plan means no index can serve it.
+# SQLite has no full-text index, so /products/search is only checked on PostgreSQL.
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.run import configure_environment
+
+EXPLAINED = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Assert that hot route queries use indexes")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    return parser.parse_args()
+
+
+def hot_requests(data: dict, token: str, admin_token: str) -> list:  # (label, method, url, options, checked on SQLite)
+    user = {"Authorization": f"Bearer {token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    product_id = data["product_ids"][0]
+    return [
+        ("POST /auth/signin", "POST", "/auth/signin", {"json": {"email": data["user_emails"][0], "password": "benchmark"}}, True),
+        ("GET /products by category and price", "GET", "/products/", {"params": {"category": "home", "sort_by": "price"}}, True),
+        ("GET /products by category and name", "GET", "/products/", {"params": {"category": "home", "sort_by": "name", "order": "desc"}}, True),
+        ("GET /products by price", "GET", "/products/", {"params": {"sort_by": "price"}}, True),
+        ("GET /products by name", "GET", "/products/", {"params": {"sort_by": "name"}}, True),
+        ("GET /products/{id}", "GET", f"/products/{product_id}", {}, True),
+        ("GET /products/search", "GET", "/products/search", {"params": {"keyword": "lamp"}}, False),
+        ("GET /cart", "GET", "/cart/", {"headers": user}, True),
+        ("GET /cart/summary", "GET", "/cart/summary", {"headers": user}, True),
+        ("POST /cart", "POST", "/cart/", {"headers": user, "json": {"product_id": product_id, "quantity": 1}}, True),
+        ("PUT /cart/{id}", "PUT", f"/cart/{product_id}", {"headers": user, "json": {"quantity": 2}}, True),
+        ("PUT /cart/batch", "PUT", "/cart/batch", {"headers": user, "json": {"items": [{"product_id": product_id, "quantity": 1}]}}, True),
+        ("GET /orders", "GET", "/orders/", {"headers": user}, True),
+        ("POST /checkout", "POST", "/checkout/", {"headers": user}, True),
+        ("GET /admin/products/{id}", "GET", f"/admin/products/{product_id}", {"headers": admin}, True),
+        ("GET /admin/reports/revenue/daily", "GET", "/admin/reports/revenue/daily", {"headers": admin}, True),
+        ("GET /admin/reports/products/top", "GET", "/admin/reports/products/top", {"headers": admin}, True),
+        ("GET /admin/reports/categories", "GET", "/admin/reports/categories", {"headers": admin}, True),
+    ]
+
+
+def sqlite_violations(rows) -> list:
+    from app.core.database import Base
+
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        # "SCAN products" reads every row; "SCAN products USING INDEX ..." walks an index in order
+        if words[0] == "SCAN" and words[1] in Base.metadata.tables and "INDEX" not in detail:
+            problems.append(detail)
+    return problems
+
+
+def postgres_violations(plan) -> list:
+    problems = []
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if node["Node Type"] == "Seq Scan":
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        stack.extend(node.get("Plans", []))
+    return problems
+
+
+async def explain(connection, statement: str, parameters) -> list:
+    if connection.dialect.name == "postgresql":
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        return postgres_violations(json.loads(plan) if isinstance(plan, str) else plan)
+    result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return sqlite_violations(result.all())
+
+
+async def drive(data: dict) -> list:
+    import httpx
+    from sqlalchemy import event, text
+    from app.auth.utils import create_access_token
+    from app.core.database import async_engine
+    from app.main import app
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINED):
+            captured.append((statement, parameters))
+
+    token = create_access_token({"sub": data["user_emails"][0], "role": "user"})
+    admin_token = create_access_token({"sub": "admin@bench.example.com", "role": "admin"})
+    failures = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for label, method, url, options, check_on_sqlite in hot_requests(data, token, admin_token):
+                captured.clear()
+                event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+                try:
+                    response = await client.request(method, url, **options)
+                finally:
+                    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+                if response.status_code >= 500:
+                    failures.append(f"{label}: request failed with {response.status_code}")
+                    continue
+                if async_engine.dialect.name == "sqlite" and not check_on_sqlite:
+                    print(f"skip  {label} (no index for it on SQLite)")
+                    continue
+
+                problems = []
+                async with async_engine.connect() as connection:
+                    if connection.dialect.name == "postgresql":
+                        await connection.execute(text("SET enable_seqscan = off"))
+                    for statement, parameters in captured:
+                        problems += [f"{problem}\n      {' '.join(statement.split())}" for problem in await explain(connection, statement, parameters)]
+                    await connection.rollback()
+                print(f"{'FAIL' if problems else 'ok':<6}{label} ({len(captured)} statements)")
+                failures += [f"{label}: {problem}" for problem in problems]
+    return failures
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    from benchmarks.seed import seed
+
+    data = seed(products=args.products, users=args.users, orders_per_user=5, cart_lines=3)
+    failures = asyncio.run(drive(data))
+    if failures:
+        print("\nQueries without a usable index:")
+        for line in failures:
+            print(f"  - {line}")
+        return 1
+    print("\nEvery hot route query uses an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
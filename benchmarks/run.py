@@ -0,0 +1,251 @@
+# End-to-end load and latency benchmark for every router.
+#
+#   python -m benchmarks.run --products 20000 --users 200 --duration 30 --concurrency 32
+#   python -m benchmarks.run --write-baseline          # record benchmarks/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+#
+# By default the app is driven in-process through httpx's ASGI transport against a throwaway SQLite
+# file; pass --database-url for a local PostgreSQL. Exit code 1 means a regression against the baseline.
+# Needs httpx and aiosqlite besides the app's own packages (pip install httpx aiosqlite).
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+DEFAULT_MIX = "browse=35,product=15,search=20,add_to_cart=15,checkout=5,history=10"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="E-commerce backend load benchmark")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--orders-per-user", type=int, default=5)
+    parser.add_argument("--cart-lines", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load after warm-up")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. browse=50,search=50")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(__file__), "baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 / throughput drift vs baseline")
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--json", help="Also write the report to this file")
+    return parser.parse_args()
+
+
+def configure_environment(args):  # Settings are read at import time, so this must run before importing app
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("REPLICA_DATABASE_URL", None)
+    defaults = {
+        "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "600", "REFRESH_TOKEN_EXPIRE_DAYS": "1",
+        "EMAIL_HOST": "127.0.0.1", "EMAIL_PORT": "2525", "EMAIL_USERNAME": "bench@example.com", "EMAIL_PASSWORD": "x",
+        "OUTBOX_ENABLED": "false", "LOG_LEVEL": "WARNING",
+        "RATE_LIMIT_ENABLED": "false", "LOAD_SHED_ENABLED": "false",  # Measure the app itself, not its defences
+        "MAINTENANCE_ENABLED": "false",  # No purge / ANALYZE / cache warm-up landing in the middle of a run
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    async def call(self, client, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            self.latencies[label].append(elapsed)
+            if response.status_code >= 500 or response.status_code in (401, 403, 422):  # 400/404/409 are business outcomes
+                self.errors[label] += 1
+        return response
+
+
+# Scenarios: each one is a short user journey hitting one or more endpoints
+class Scenarios:
+
+    def __init__(self, recorder: Recorder, data: dict, tokens: list, rng: random.Random):
+        from benchmarks.seed import CATEGORIES, KEYWORDS
+        self.recorder = recorder
+        self.product_ids = data["product_ids"]
+        self.tokens = tokens
+        self.categories = CATEGORIES
+        self.keywords = KEYWORDS
+        self.rng = rng
+
+    def _auth(self):
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    async def browse(self, client):
+        params = {"limit": 20, "category": self.rng.choice(self.categories)}
+        if self.rng.random() < 0.5:
+            params.update(sort_by=self.rng.choice(["price", "name"]), order=self.rng.choice(["asc", "desc"]))
+        response = await self.recorder.call(client, "GET /products", "GET", "/products/", params=params)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor and self.rng.random() < 0.5:  # Follow to the next page like a real shopper / crawler
+            await self.recorder.call(client, "GET /products (next page)", "GET", "/products/", params={**params, "cursor": cursor})
+
+    async def product(self, client):
+        await self.recorder.call(client, "GET /products/{id}", "GET", f"/products/{self.rng.choice(self.product_ids)}")
+
+    async def search(self, client):
+        await self.recorder.call(client, "GET /products/search", "GET", "/products/search", params={"keyword": self.rng.choice(self.keywords)})
+
+    async def add_to_cart(self, client):
+        body = {"product_id": self.rng.choice(self.product_ids), "quantity": 1}
+        await self.recorder.call(client, "POST /cart", "POST", "/cart/", json=body, headers=self._auth())
+
+    async def checkout(self, client):
+        headers = self._auth()
+        for product_id in self.rng.sample(self.product_ids, 3):
+            await self.recorder.call(client, "POST /cart", "POST", "/cart/", json={"product_id": product_id, "quantity": 1}, headers=headers)
+        await self.recorder.call(client, "POST /checkout", "POST", "/checkout/", headers=headers)
+
+    async def history(self, client):
+        await self.recorder.call(client, "GET /orders", "GET", "/orders/", headers=self._auth())
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def build_report(recorder: Recorder, duration: float, args) -> dict:
+    endpoints = {}
+    for label, values in sorted(recorder.latencies.items()):
+        values.sort()
+        endpoints[label] = {
+            "count": len(values),
+            "errors": recorder.errors[label],
+            "rps": len(values) / duration,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    scale = {key: getattr(args, key) for key in ("products", "users", "orders_per_user", "cart_lines", "concurrency", "mix")}
+    return {"scale": scale, "duration": duration, "endpoints": endpoints}
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<28}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, row in report["endpoints"].items():
+        print(f"{label:<28}{row['count']:>8}{row['errors']:>8}{row['rps']:>10.1f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    if baseline.get("scale") != report["scale"]:
+        print("\nBaseline was recorded at a different scale/mix, skipping comparison.")
+        return []
+
+    regressions = []
+    for label, base in baseline["endpoints"].items():
+        current = report["endpoints"].get(label)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {current['p95_ms']:.2f}ms vs baseline {base['p95_ms']:.2f}ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: {current['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{label}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+async def drive(args, data: dict) -> dict:
+    import httpx
+    from app.auth.utils import create_access_token
+    from app.main import app
+
+    rng = random.Random(7)
+    tokens = [create_access_token({"sub": email, "role": "user"}) for email in data["user_emails"]]
+    recorder = Recorder()
+    scenarios = Scenarios(recorder, data, tokens, rng)
+    weights = parse_mix(args.mix)
+    names, cumulative = list(weights), list(weights.values())
+    stop_at = None
+
+    async def worker(client):
+        while stop_at is None or time.perf_counter() < stop_at:
+            scenario = rng.choices(names, weights=cumulative)[0]
+            await getattr(scenarios, scenario)(client)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # A 500 is counted as an error, not the end of the run
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            stop_at = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))  # Warm caches and pools
+
+            recorder.recording = True
+            started = time.perf_counter()
+            stop_at = started + args.duration
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return build_report(recorder, elapsed, args)
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    from benchmarks.seed import seed
+
+    if args.skip_seed:
+        from sqlalchemy import select
+        from app.auth.models import User, UserRole
+        from app.core.database import SessionLocal
+        from app.products.models import Product
+        with SessionLocal() as db:
+            data = {
+                "product_ids": db.scalars(select(Product.id)).all(),
+                "user_emails": db.scalars(select(User.email).filter(User.role == UserRole.user)).all(),
+            }
+    else:
+        started = time.perf_counter()
+        data = seed(args.products, args.users, args.orders_per_user, args.cart_lines)
+        print(f"Seeded {len(data['product_ids'])} products / {len(data['user_emails'])} users in {time.perf_counter() - started:.1f}s")
+
+    report = asyncio.run(drive(args, data))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
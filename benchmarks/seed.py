@@ -0,0 +1,94 @@
+# Synthetic data for the benchmark suite: catalog, users, carts and order history at a configurable scale.
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, select
+from app.auth import hashing
+from app.auth.models import User, UserRole
+from app.cart.models import Cart
+from app.core.database import SessionLocal
+from app.core.migrations import upgrade_database
+from app.orders.models import Order, OrderItem, OrderStatus
+from app.products.models import Product, ProductStockShard
+from app.reports.models import DailyProductSales, DailySales
+from app.reports.rollup import rebuild_sales_rollups
+
+ADJECTIVES = ["red", "blue", "classic", "vintage", "smart", "wireless", "organic", "leather", "compact", "premium"]
+NOUNS = ["shoe", "jacket", "lamp", "phone", "watch", "backpack", "kettle", "chair", "headphones", "camera"]
+CATEGORIES = ["shoes", "clothing", "home", "electronics", "accessories", "kitchen", "furniture", "audio"]
+KEYWORDS = ADJECTIVES + NOUNS + CATEGORIES  # Search terms that are guaranteed to hit
+BATCH = 5000
+
+
+def _batched(rows, size=BATCH):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed(products: int, users: int, orders_per_user: int, cart_lines: int, seed_value: int = 42) -> dict:
+    rng = random.Random(seed_value)
+    upgrade_database()
+
+    with SessionLocal() as db:
+        for model in (DailyProductSales, DailySales, OrderItem, Order, Cart, ProductStockShard, Product, User):  # Children first
+            db.execute(delete(model))
+        db.commit()
+
+        product_rows = [
+            {
+                "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}",
+                "description": "Synthetic benchmark product",
+                "price": round(rng.uniform(1, 1000), 2),
+                "stock": 1_000_000,  # Large enough that checkouts never run out mid-run
+                "category": rng.choice(CATEGORIES),
+                "image_url": f"https://img.example.com/{index}.jpg",
+            }
+            for index in range(products)
+        ]
+        for batch in _batched(product_rows):
+            db.execute(insert(Product), batch)
+
+        password = hashing.hash_password("benchmark", 4)  # One cheap hash shared by every synthetic user
+        user_rows = [
+            {"name": f"user {index}", "email": f"user{index}@bench.example.com", "hashed_password": password, "role": UserRole.user}
+            for index in range(users)
+        ]
+        user_rows.append({"name": "admin", "email": "admin@bench.example.com", "hashed_password": password, "role": UserRole.admin})
+        for batch in _batched(user_rows):
+            db.execute(insert(User), batch)
+        db.commit()
+
+        product_ids = db.scalars(select(Product.id)).all()
+        catalog = {row.id: row for row in db.execute(select(Product.id, Product.price, Product.name, Product.image_url))}
+        user_ids = db.scalars(select(User.id).filter(User.role == UserRole.user)).all()
+
+        cart_rows = []
+        for user_id in user_ids:
+            for product_id in rng.sample(product_ids, min(cart_lines, len(product_ids))):
+                cart_rows.append({"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)})
+        for batch in _batched(cart_rows):
+            db.execute(insert(Cart), batch)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for user_id in user_ids:
+            for _ in range(orders_per_user):
+                lines = [(product_id, rng.randint(1, 3)) for product_id in rng.sample(product_ids, min(3, len(product_ids)))]
+                order = Order(
+                    user_id=user_id,
+                    total_amount=sum(catalog[product_id].price * quantity for product_id, quantity in lines),
+                    status=OrderStatus.paid,
+                    created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                )
+                db.add(order)
+                db.flush()
+                db.execute(insert(OrderItem), [
+                    {
+                        "order_id": order.id, "product_id": product_id, "quantity": quantity, "price_at_purchase": catalog[product_id].price,
+                        "product_name": catalog[product_id].name, "product_image_url": catalog[product_id].image_url,
+                    }
+                    for product_id, quantity in lines
+                ])
+        db.commit()
+
+        emails = [row["email"] for row in user_rows if row["role"] == UserRole.user]
+    rebuild_sales_rollups()  # Seeded orders bypass checkout
+    return {"product_ids": product_ids, "user_emails": emails}
@@ -0,0 +1,95 @@
+# Serialization benchmark: per-row cost of turning a product page into JSON bytes, the response_model
+# way (ORM objects validated through pydantic) against result rows fed to the compiled RowSerializer,
+# plus what gzip / brotli then save on the wire.
+#
+#   python -m benchmarks.serialization
+#   python -m benchmarks.serialization --rows 1000 --repeat 50
+#
+# "load" rows include fetching the page from the database, "encode" rows time serialization alone.
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from benchmarks.run import configure_environment
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-row JSON serialization and compression cost")
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per response")
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args()
+
+
+def per_row_us(fn, rows: int, repeat: int) -> float:  # Best of `repeat`, the least disturbed run
+    fn()  # Warm up: compiled validators, statement cache
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best / rows * 1e6
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    from typing import List
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from app.core.compression import brotli
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.products.cache import PRODUCT_COLUMNS, PRODUCT_LIST
+    from app.products.models import Product
+    from app.products.schemas import ProductOut
+    from benchmarks.seed import seed
+
+    seed(products=args.rows, users=1, orders_per_user=0, cart_lines=0)
+    adapter = TypeAdapter(List[ProductOut])
+
+    with SessionLocal() as db:
+        def load_objects():
+            db.expunge_all()  # Each request starts with an empty identity map
+            return db.scalars(select(Product).order_by(Product.id).limit(args.rows)).all()
+
+        def load_rows():
+            return db.execute(select(*PRODUCT_COLUMNS).order_by(Product.id).limit(args.rows)).all()
+
+        def stdlib(content):  # Older FastAPI: jsonable python, then json.dumps in JSONResponse
+            return json.dumps(adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json"), separators=(",", ":")).encode()
+
+        def response_model(content):  # Current FastAPI: validate, then pydantic's own JSON encoder
+            return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+        objects, rows = load_objects(), load_rows()
+        body = PRODUCT_LIST.dumps(rows)
+        assert json.loads(body) == json.loads(response_model(objects)), "RowSerializer output differs from the response_model"
+
+        results = {
+            "encode: response_model + json.dumps": per_row_us(lambda: stdlib(objects), args.rows, args.repeat),
+            "encode: response_model (dump_json)": per_row_us(lambda: response_model(objects), args.rows, args.repeat),
+            "encode: RowSerializer, ORM objects": per_row_us(lambda: PRODUCT_LIST.dumps(objects), args.rows, args.repeat),
+            "encode: RowSerializer, result rows": per_row_us(lambda: PRODUCT_LIST.dumps(rows), args.rows, args.repeat),
+            "load + encode: before": per_row_us(lambda: response_model(load_objects()), args.rows, args.repeat),
+            "load + encode: after": per_row_us(lambda: PRODUCT_LIST.dumps(load_rows()), args.rows, args.repeat),
+        }
+
+    print(f"{args.rows} rows, {len(body)} bytes of JSON\n")
+    print(f"{'path':<40}{'us/row':>10}")
+    for label, value in results.items():
+        print(f"{label:<40}{value:>10.2f}")
+
+    print(f"\n{'encoding':<40}{'bytes':>10}{'ms':>10}")
+    encoders = {"gzip": lambda: gzip.compress(body, settings.COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        encoders["br"] = lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for name, encode in encoders.items():
+        print(f"{name:<40}{len(encode()):>10}{per_row_us(encode, 1, args.repeat) / 1000:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())